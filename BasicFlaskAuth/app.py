@@ -1,8 +1,18 @@
 from flask import Flask, request, abort
-import json
+import os
+import sys
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+# the JWKS key store and the verified-token cache are the coffee shop
+# backend's (projects/03_coffee_shop_full_stack/starter_code/backend/src/auth),
+# imported from there so both apps run the same implementation
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    '..', 'projects', '03_coffee_shop_full_stack', 'starter_code', 'backend'
+))
+from src.auth.jwks import JWKSKeyStore
+from src.auth.token_cache import VerifiedTokenCache
 
 
 app = Flask(__name__)
@@ -11,6 +21,18 @@ AUTH0_DOMAIN = @TODO_REPLACE_WITH_YOUR_DOMAIN
 ALGORITHMS = ['RS256']
 API_AUDIENCE = @TODO_REPLACE_WITH_YOUR_API_AUDIENCE
 
+# signing keys are cached by kid and refreshed in the background;
+# set JWKS_FILE to a local jwks.json to run without network access
+key_store = JWKSKeyStore(
+    url=f'https://{AUTH0_DOMAIN}/.well-known/jwks.json',
+    path=os.environ.get('JWKS_FILE')
+)
+
+# verified payloads are reused until the token expires; tokens signed with
+# a key that leaves the JWKS are dropped when the key set rotates
+token_cache = VerifiedTokenCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)))
+key_store.on_rotation(token_cache.drop_kids)
+
 
 class AuthError(Exception):
     def __init__(self, error, status_code):
@@ -52,25 +74,14 @@ def get_token_auth_header():
 
 
 def verify_decode_jwt(token):
-    jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
     unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
     if 'kid' not in unverified_header:
         raise AuthError({
             'code': 'invalid_header',
             'description': 'Authorization malformed.'
         }, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e']
-            }
+    rsa_key = key_store.get_key(unverified_header['kid'])
     if rsa_key:
         try:
             payload = jwt.decode(
@@ -105,12 +116,27 @@ def verify_decode_jwt(token):
             }, 400)
 
 
+def verified_payload(token):
+    """Decodes the token, reusing the payload of an earlier verification
+    """
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_decode_jwt(token)
+        if token_cache.is_revoked(token, payload):
+            raise AuthError({
+                'code': 'token_revoked',
+                'description': 'Token has been revoked.'
+            }, 401)
+        token_cache.put(token, jwt.get_unverified_header(token)['kid'], payload)
+    return payload
+
+
 def requires_auth(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
         token = get_token_auth_header()
         try:
-            payload = verify_decode_jwt(token)
+            payload = verified_payload(token)
         except:
             abort(401)
         return f(payload, *args, **kwargs)
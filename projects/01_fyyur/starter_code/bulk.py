@@ -0,0 +1,298 @@
+import csv
+import json
+from collections import defaultdict, deque
+from datetime import timezone
+from itertools import islice
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+
+
+DEFAULT_CHUNK_SIZE = 500
+# separates the values of a list column (genres) in a CSV cell
+LIST_SEPARATOR = ';'
+FALSE_VALUES = ('', '0', 'false', 'f', 'no', 'n', 'off')
+
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+
+def read_rows(lines, format='csv'):
+    '''
+    Streams (line number, row dict) pairs from an iterable of text lines,
+    either CSV with a header row or JSON Lines ('json'). Lines that cannot
+    be parsed are yielded as (line number, ValueError).
+    '''
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('expected a JSON object')
+            yield line_number, row
+        except ValueError as e:
+            yield line_number, ValueError(str(e))
+
+
+def form_data(row, list_fields=(), boolean_fields=()):
+    # the row as the form data a browser would post, so the existing form
+    # validators apply unchanged
+    data = MultiDict()
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+        if key in list_fields:
+            values = value if isinstance(value, list) else str(value).split(LIST_SEPARATOR)
+            for item in values:
+                if str(item).strip():
+                    data.add(key, str(item).strip())
+        elif key in boolean_fields:
+            if value is True or (value is not False and str(value).strip().lower() not in FALSE_VALUES):
+                data.add(key, 'y')
+        else:
+            data.add(key, str(value).strip())
+    return data
+
+
+#----------------------------------------------------------------------------#
+# Importers.
+#----------------------------------------------------------------------------#
+
+class EntityImporter:
+    '''
+    Imports venues or artists. Each chunk is one multi-row INSERT returning
+    the new ids, one executemany INSERT of their genre rows and one search
+    document UPDATE, committed once; the in-memory search index, if any,
+    is updated after the commit.
+    '''
+    list_fields = ('genres',)
+    boolean_fields = ('seeking_talent',)
+
+    def __init__(self, db, kind, model, form_class, search_index):
+        self.db = db
+        self.kind = kind
+        self.model = model
+        self.form_class = form_class
+        self.search_index = search_index
+
+    def values(self, form, row):
+        columns = self.model.__table__.c
+        values = {
+            name: field.data for name, field in form._fields.items()
+            if name in columns and name != 'id'
+        }
+        values['genres'] = list(dict.fromkeys(form.genres.data))
+        return values
+
+    def resolve(self, rows):
+        return rows, []
+
+    def insert(self, rows):
+        table = self.model.__table__
+        genre_table = self.model.genre_rows.property.mapper.local_table
+        rows = [dict(values) for _, values in rows]
+        genres = [values.pop('genres') for values in rows]
+        # RETURNING does not promise VALUES order, so each id comes back
+        # with its row's values and is matched on them; rows with identical
+        # values are interchangeable
+        columns = list(rows[0])
+        result = self.db.session.execute(
+            table.insert().values(rows).returning(table.c.id, *[table.c[column] for column in columns])
+        )
+        ids_by_values = defaultdict(deque)
+        for returned in result:
+            ids_by_values[tuple(returned[1:])].append(returned[0])
+        ids = [ids_by_values[tuple(values[column] for column in columns)].popleft() for values in rows]
+        genre_rows = [
+            {self.kind + '_id': entity_id, 'name': name}
+            for entity_id, names in zip(ids, genres) for name in names
+        ]
+        if genre_rows:
+            self.db.session.execute(genre_table.insert(), genre_rows)
+        self.search_index.stage(self.kind, ids)
+        return ids
+
+    def published(self, ids):
+        self.search_index.publish(self.kind, ids)
+
+    def cache_groups(self, rows, ids):
+        return ['index', self.kind + 's']
+
+
+class ShowImporter:
+    '''
+    Imports shows. Venues and artists may be given by id (venue_id,
+    artist_id) or by exact name (venue_name, artist_name); a chunk resolves
+    all of them with one query per table, and skips shows that already
+    exist with one more. Valid rows go in one executemany INSERT.
+    '''
+    list_fields = ()
+    boolean_fields = ()
+    form_class = ShowForm
+
+    def __init__(self, db, show_model, venue_model, artist_model):
+        self.db = db
+        self.show_model = show_model
+        self.venue_model = venue_model
+        self.artist_model = artist_model
+
+    def values(self, form, row):
+        start_time = form.start_time.data
+        if start_time.tzinfo is None:
+            # like the model default, times without an offset are UTC
+            start_time = start_time.replace(tzinfo=timezone.utc)
+        return {
+            'venue_id': form.venue_id.data,
+            'artist_id': form.artist_id.data,
+            'venue_name': row.get('venue_name'),
+            'artist_name': row.get('artist_name'),
+            'start_time': start_time,
+        }
+
+    def lookup(self, model, ids, names):
+        # the existing ids among ids and {name: [ids]} for names, in one query
+        criteria = []
+        if ids:
+            criteria.append(model.id.in_(ids))
+        if names:
+            criteria.append(model.name.in_(names))
+        found_ids, found_names = set(), {}
+        if criteria:
+            for entity_id, name in self.db.session.query(model.id, model.name).filter(self.db.or_(*criteria)):
+                found_ids.add(entity_id)
+                found_names.setdefault(name, []).append(entity_id)
+        return found_ids, found_names
+
+    def reference(self, kind, values, found_ids, found_names):
+        entity_id = values[kind + '_id']
+        if entity_id:
+            try:
+                entity_id = int(entity_id)
+            except ValueError:
+                raise ValueError(f'{kind}_id must be a number')
+            if entity_id not in found_ids:
+                raise ValueError(f'unknown {kind} id {entity_id}')
+            return entity_id
+        name = values[kind + '_name']
+        if not name:
+            raise ValueError(f'{kind}_id or {kind}_name is required')
+        matches = found_names.get(name, [])
+        if len(matches) != 1:
+            raise ValueError(f'{"unknown" if not matches else "ambiguous"} {kind} name {name!r}')
+        return matches[0]
+
+    def resolve(self, rows):
+        def ids(key):
+            return {int(v[key]) for _, v in rows if v[key] and str(v[key]).isdigit()}
+
+        def names(key):
+            return {v[key] for _, v in rows if v[key]}
+
+        venues = self.lookup(self.venue_model, ids('venue_id'), names('venue_name'))
+        artists = self.lookup(self.artist_model, ids('artist_id'), names('artist_name'))
+        resolved, errors = [], []
+        for line_number, values in rows:
+            try:
+                resolved.append((line_number, {
+                    'venue_id': self.reference('venue', values, *venues),
+                    'artist_id': self.reference('artist', values, *artists),
+                    'start_time': values['start_time'],
+                }))
+            except ValueError as e:
+                errors.append({'line': line_number, 'error': str(e)})
+
+        keys = {(v['venue_id'], v['artist_id'], v['start_time']) for _, v in resolved}
+        existing = set()
+        if keys:
+            show = self.show_model
+            existing = {tuple(row) for row in self.db.session.query(
+                show.venue_id, show.artist_id, show.start_time
+            ).filter(
+                self.db.tuple_(show.venue_id, show.artist_id, show.start_time).in_(list(keys))
+            )}
+        unique, seen = [], set()
+        for line_number, values in resolved:
+            key = (values['venue_id'], values['artist_id'], values['start_time'])
+            if key in existing or key in seen:
+                errors.append({'line': line_number, 'error': 'show already listed'})
+            else:
+                seen.add(key)
+                unique.append((line_number, values))
+        return unique, errors
+
+    def insert(self, rows):
+        self.db.session.execute(self.show_model.__table__.insert(), [values for _, values in rows])
+        return []
+
+    def published(self, ids):
+        pass
+
+    def cache_groups(self, rows, ids):
+        groups = {'index', 'shows', 'venues', 'artists'}
+        for _, values in rows:
+            groups.add(f"venue:{values['venue_id']}")
+            groups.add(f"artist:{values['artist_id']}")
+        return sorted(groups)
+
+
+def make_importers(db, models, search_index):
+    return {
+        'venues': EntityImporter(db, 'venue', models['venue'], VenueForm, search_index),
+        'artists': EntityImporter(db, 'artist', models['artist'], ArtistForm, search_index),
+        'shows': ShowImporter(db, models['show'], models['venue'], models['artist']),
+    }
+
+
+#----------------------------------------------------------------------------#
+# Import.
+#----------------------------------------------------------------------------#
+
+def import_rows(db, importer, rows, page_cache, chunk_size=DEFAULT_CHUNK_SIZE):
+    '''
+    Validates rows with the importer's form, resolves references and
+    inserts chunk_size rows per transaction. Returns
+        {'inserted': n, 'rejected': n, 'errors': [{'line': n, 'errors'|'error': ...}]}
+    A chunk that fails to commit is rolled back and each of its rows is
+    reported; the import carries on with the next chunk.
+    '''
+    rows = iter(rows)
+    report = {'inserted': 0, 'rejected': 0, 'errors': []}
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        valid, errors = [], []
+        for line_number, row in chunk:
+            if isinstance(row, Exception):
+                errors.append({'line': line_number, 'error': str(row)})
+                continue
+            form = importer.form_class(
+                formdata=form_data(row, importer.list_fields, importer.boolean_fields),
+                meta={'csrf': False}
+            )
+            if form.validate():
+                valid.append((line_number, importer.values(form, row)))
+            else:
+                errors.append({'line': line_number, 'errors': form.errors})
+        resolved, resolve_errors = importer.resolve(valid) if valid else ([], [])
+        errors.extend(resolve_errors)
+        if resolved:
+            try:
+                ids = importer.insert(resolved)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                errors.extend({'line': line_number, 'error': f'chunk rolled back: {e}'} for line_number, _ in resolved)
+            else:
+                importer.published(ids)
+                page_cache.invalidate(*importer.cache_groups(resolved, ids))
+                report['inserted'] += len(resolved)
+        report['rejected'] += len(errors)
+        report['errors'].extend(sorted(errors, key=lambda error: error['line'] or 0))
+    return report
@@ -0,0 +1,217 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from functools import wraps
+
+from flask import request, session
+
+
+MISSING = object()
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class LRUCache:
+    '''
+    In-process LRU cache with a per-entry TTL.
+    '''
+    def __init__(self, maxsize=512, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return MISSING
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return MISSING
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete_prefix(self, prefix):
+        with self.lock:
+            for key in [key for key in self.entries if key.startswith(prefix)]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class LocalKeyValueStore:
+    '''
+    Local stand-in for a shared key/value server. Implements the subset of
+    the redis-py client that SharedCache uses, so tests and single-process
+    deployments run without a server.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = {}
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.monotonic():
+                del self.data[key]
+                return None
+            return value
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.data[key] = (time.monotonic() + ex if ex else None, value)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        with self.lock:
+            keys = [key for key in self.data if fnmatchcase(key, match)]
+        return iter(keys)
+
+    def flushdb(self):
+        with self.lock:
+            self.data.clear()
+
+
+class SharedCache:
+    '''
+    Cache stored in a key/value server shared by every worker, e.g. redis.
+    Values are pickled; keys are namespaced so the cache can share a server.
+    '''
+    def __init__(self, client, ttl=300, namespace='fyyur:'):
+        self.client = client
+        self.ttl = ttl
+        self.namespace = namespace
+
+    def get(self, key):
+        value = self.client.get(self.namespace + key)
+        return MISSING if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.namespace + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete_prefix(self, prefix):
+        keys = list(self.client.scan_iter(match=self.namespace + prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        self.delete_prefix('')
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.namespace + '*'))
+
+
+def make_cache_backend(config):
+    backend = config.get('CACHE_BACKEND', 'local')
+    ttl = config.get('CACHE_TTL', 300)
+    if backend == 'shared':
+        url = config.get('CACHE_URL')
+        if url:
+            import redis
+            client = redis.Redis.from_url(url)
+        else:
+            client = LocalKeyValueStore()
+        return SharedCache(client, ttl=ttl)
+    return LRUCache(maxsize=config.get('CACHE_MAXSIZE', 512), ttl=ttl)
+
+
+#----------------------------------------------------------------------------#
+# Page cache.
+#----------------------------------------------------------------------------#
+
+class PageCache:
+    '''
+    Caches rendered pages and query results under "<group>|<variant>" keys.
+    invalidate(group) drops every entry of a group, e.g. invalidate('venue:3')
+    drops that venue's page for every query string.
+    '''
+    def __init__(self, backend):
+        self.backend = backend
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def remember(self, group, variant, compute):
+        '''
+        Returns compute()'s result cached under "<group>|query:<variant>",
+        for results that are not a whole page, e.g. the rows of a POSTed
+        search. The value must be picklable for the shared backend.
+        '''
+        key = group + '|query:' + variant
+        value = self.backend.get(key)
+        if value is not MISSING:
+            self._count(True)
+            return value
+        self._count(False)
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+    def page(self, group):
+        '''
+        Route decorator. group may be a format string filled from the view
+        arguments, e.g. 'venue:{venue_id}'. Requests with pending flash
+        messages bypass the cache, since the layout renders them.
+        '''
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if session.get('_flashes'):
+                    return view(*args, **kwargs)
+                key = group.format(**kwargs) + '|page:' + request.query_string.decode()
+                value = self.backend.get(key)
+                if value is not MISSING:
+                    self._count(True)
+                    return value
+                self._count(False)
+                response = view(*args, **kwargs)
+                if isinstance(response, str):
+                    self.backend.set(key, response)
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *groups):
+        for group in set(groups):
+            self.backend.delete_prefix(group + '|')
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.backend),
+        }
@@ -11,3 +11,33 @@ DEBUG = True
 
 # TODO IMPLEMENT DATABASE URL
 SQLALCHEMY_DATABASE_URI = '<Put your local database url>'
+
+# Number of artists per /artists page (keyset pagination)
+ARTISTS_PER_PAGE = 50
+
+# Past shows listed per "load more" page on venue and artist detail pages
+PAST_SHOWS_LIMIT = 12
+
+# Search backend for venues and artists: 'postgres', 'memory' or 'auto' (by database dialect)
+SEARCH_BACKEND = 'auto'
+SEARCH_RESULTS_LIMIT = 100
+
+# Page and query result cache: 'local' (in-process LRU) or 'shared'
+# (key/value server at CACHE_URL, or a local stand-in when CACHE_URL is unset)
+CACHE_BACKEND = 'local'
+CACHE_URL = None
+CACHE_TTL = 300
+CACHE_MAXSIZE = 512
+
+# Number of shows per /shows page (keyset pagination)
+SHOWS_PER_PAGE = 30
+
+# Per-request SQL profiling: X-Query-Profile header and logs on the
+# query_profiler logger. Defaults to on in debug mode
+# QUERY_PROFILER = True
+# Serve the recent profiles as JSON at /_profiler; off unless set, since it
+# exposes the SQL of recent requests
+# QUERY_PROFILER_ENDPOINT = True
+
+# Seconds between runs of the venue/artist stats refresher (0 disables it)
+STATS_REFRESH_INTERVAL = 60
@@ -0,0 +1,39 @@
+"""show_list composite indexes and trigram name indexes
+
+Revision ID: 3c5e8f2a9d41
+Revises: 61746c95cf2c
+Create Date: 2026-10-18 10:12:40.512305
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e8f2a9d41'
+down_revision = '61746c95cf2c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # show lookups by artist or venue, range-filtered on start_time
+    op.create_index('ix_show_list_artist_id_start_time', 'show_list', ['artist_id', 'start_time'])
+    op.create_index('ix_show_list_venue_id_start_time', 'show_list', ['venue_id', 'start_time'])
+    # "upcoming" scans across all shows; a partial index on start_time > now()
+    # is not possible because now() is not immutable
+    op.create_index('ix_show_list_start_time', 'show_list', ['start_time'])
+
+    # trigram indexes serve name ILIKE '%term%' searches
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_venue_name_trgm', 'venue', ['name'],
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_artist_name_trgm', 'artist', ['name'],
+                    postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.drop_index('ix_artist_name_trgm', table_name='artist')
+    op.drop_index('ix_venue_name_trgm', table_name='venue')
+    op.drop_index('ix_show_list_start_time', table_name='show_list')
+    op.drop_index('ix_show_list_venue_id_start_time', table_name='show_list')
+    op.drop_index('ix_show_list_artist_id_start_time', table_name='show_list')
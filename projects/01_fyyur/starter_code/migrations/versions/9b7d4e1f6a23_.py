@@ -0,0 +1,34 @@
+"""search_vector columns for venue and artist full-text search
+
+Revision ID: 9b7d4e1f6a23
+Revises: 3c5e8f2a9d41
+Create Date: 2026-10-18 11:03:17.204816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '9b7d4e1f6a23'
+down_revision = '3c5e8f2a9d41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.add_column(table, sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+        # same document as search.search_document(): name, city, state, genres
+        op.execute(
+            f"UPDATE {table} SET search_vector = to_tsvector('simple', "
+            f"coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || "
+            f"coalesce(state, '') || ' ' || coalesce(genres, ''))"
+        )
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
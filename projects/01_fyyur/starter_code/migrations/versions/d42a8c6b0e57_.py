@@ -0,0 +1,56 @@
+"""venue_genre and artist_genre tables replacing the genres strings
+
+Revision ID: d42a8c6b0e57
+Revises: 9b7d4e1f6a23
+Create Date: 2026-10-18 11:48:52.633920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd42a8c6b0e57'
+down_revision = '9b7d4e1f6a23'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.create_table(f'{table}_genre',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=120), nullable=False),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(f'{table}_id', 'name')
+        )
+        op.create_index(f'ix_{table}_genre_name_{table}_id', f'{table}_genre', ['name', f'{table}_id'])
+        op.create_index(f'ix_{table}_state_city', table, ['state', 'city'])
+
+        # genres was written as a Postgres array literal ({Jazz,"Rock n Roll"}),
+        # so let Postgres parse it rather than splitting on commas
+        op.execute(
+            f"INSERT INTO {table}_genre ({table}_id, name) "
+            f"SELECT DISTINCT id, trim(genre) FROM {table}, unnest(genres::text[]) genre "
+            f"WHERE genres LIKE '{{%}}' AND trim(genre) <> ''"
+        )
+        # anything else is a plain comma separated string
+        op.execute(
+            f"INSERT INTO {table}_genre ({table}_id, name) "
+            f"SELECT DISTINCT id, trim(genre) FROM {table}, regexp_split_to_table(genres, ',') genre "
+            f"WHERE genres NOT LIKE '{{%}}' AND trim(genre) <> ''"
+        )
+        op.drop_column(table, 'genres')
+
+
+def downgrade():
+    for table, length in (('venue', 500), ('artist', 120)):
+        op.add_column(table, sa.Column('genres', sa.String(length=length), nullable=True))
+        op.execute(
+            f"UPDATE {table} SET genres = ("
+            f"SELECT array_agg(name ORDER BY name)::text FROM {table}_genre "
+            f"WHERE {table}_genre.{table}_id = {table}.id)"
+        )
+        op.drop_index(f'ix_{table}_state_city', table_name=table)
+        op.drop_index(f'ix_{table}_genre_name_{table}_id', table_name=f'{table}_genre')
+        op.drop_table(f'{table}_genre')
@@ -0,0 +1,89 @@
+"""venue_stats and artist_stats summaries maintained by show_list triggers
+
+Revision ID: e7f3a91c5d20
+Revises: d42a8c6b0e57
+Create Date: 2026-10-18 14:06:41.518237
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7f3a91c5d20'
+down_revision = 'd42a8c6b0e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venue', 'artist'):
+        op.create_table(f'{table}_stats',
+        sa.Column(f'{table}_id', sa.Integer(), nullable=False),
+        sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('next_show_time', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint([f'{table}_id'], [f'{table}.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint(f'{table}_id')
+        )
+        # the refresher looks for rows whose next show has started
+        op.create_index(f'ix_{table}_stats_next_show_time', f'{table}_stats', ['next_show_time'])
+
+        # every inserted, updated or deleted show recomputes the rows of
+        # its venue and artist (old and new, for an update) from show_list,
+        # through the ({table}_id, start_time) index. Recomputing rather
+        # than adjusting the counts stays right when a show's start time
+        # passed after it was counted. A show is upcoming while
+        # start_time >= now(), as on the pages. Rows of a venue or artist
+        # being deleted are left to the cascade
+        op.execute(f"""
+        CREATE FUNCTION show_list_{table}_stats() RETURNS trigger AS $$
+        DECLARE
+          ids integer[];
+        BEGIN
+          IF TG_OP = 'INSERT' THEN
+            ids := ARRAY[NEW.{table}_id];
+          ELSIF TG_OP = 'DELETE' THEN
+            ids := ARRAY[OLD.{table}_id];
+          ELSIF OLD.{table}_id = NEW.{table}_id AND OLD.start_time = NEW.start_time THEN
+            RETURN NULL;
+          ELSE
+            ids := ARRAY[OLD.{table}_id, NEW.{table}_id];
+          END IF;
+
+          INSERT INTO {table}_stats ({table}_id, upcoming_shows_count, past_shows_count, next_show_time)
+          SELECT e.id,
+                 count(s.start_time) FILTER (WHERE s.start_time >= now()),
+                 count(s.start_time) FILTER (WHERE s.start_time < now()),
+                 min(s.start_time) FILTER (WHERE s.start_time >= now())
+          FROM {table} e LEFT JOIN show_list s ON s.{table}_id = e.id
+          WHERE e.id = ANY(ids)
+          GROUP BY e.id
+          ON CONFLICT ({table}_id) DO UPDATE SET
+            upcoming_shows_count = EXCLUDED.upcoming_shows_count,
+            past_shows_count = EXCLUDED.past_shows_count,
+            next_show_time = EXCLUDED.next_show_time;
+          RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+        """)
+        op.execute(
+            f"CREATE TRIGGER show_list_{table}_stats AFTER INSERT OR UPDATE OR DELETE ON show_list "
+            f"FOR EACH ROW EXECUTE PROCEDURE show_list_{table}_stats()"
+        )
+
+        op.execute(
+            f"INSERT INTO {table}_stats ({table}_id, upcoming_shows_count, past_shows_count, next_show_time) "
+            f"SELECT {table}_id, count(*) FILTER (WHERE start_time >= now()), "
+            f"count(*) FILTER (WHERE start_time < now()), "
+            f"min(start_time) FILTER (WHERE start_time >= now()) "
+            f"FROM show_list GROUP BY {table}_id"
+        )
+
+
+def downgrade():
+    for table in ('venue', 'artist'):
+        op.execute(f'DROP TRIGGER show_list_{table}_stats ON show_list')
+        op.execute(f'DROP FUNCTION show_list_{table}_stats()')
+        op.drop_index(f'ix_{table}_stats_next_show_time', table_name=f'{table}_stats')
+        op.drop_table(f'{table}_stats')
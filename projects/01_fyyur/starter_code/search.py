@@ -0,0 +1,205 @@
+import re
+import threading
+from bisect import bisect_left
+from sqlalchemy import text
+
+
+#----------------------------------------------------------------------------#
+# Search documents.
+#----------------------------------------------------------------------------#
+
+def tokenize(value):
+    return re.findall(r'\w+', (value or '').lower())
+
+
+def search_document(entity):
+    # the text indexed for a venue or artist: name, city, state and genres
+    # (an association proxy list on the models)
+    genres = entity.genres
+    if not isinstance(genres, str):
+        genres = ' '.join(genres or ())
+    return ' '.join(part or '' for part in (entity.name, entity.city, entity.state, genres))
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+class SearchBackend:
+    '''
+    Common interface for the search backends.
+        models maps an entity kind ('venue', 'artist') to its model class.
+        search() returns entity ids best match first, or None for an empty
+        term (meaning "no filter").
+        stage() runs inside the transaction that writes the rows and
+        publish() after it commits, each once for a batch of ids.
+    '''
+    def __init__(self, db, models, limit=100):
+        self.db = db
+        self.models = models
+        self.limit = limit
+
+    def stage(self, kind, ids):
+        pass
+
+    def publish(self, kind, ids):
+        pass
+
+    def remove(self, kind, entity_id):
+        raise NotImplementedError
+
+    def search(self, kind, term):
+        raise NotImplementedError
+
+
+class PostgresSearchBackend(SearchBackend):
+    '''
+    Ranked prefix search over the tsvector `search_vector` column of each
+    table, served by its GIN index. stage() writes the documents in the same
+    transaction as the entities, so the caller's commit publishes both.
+    '''
+    config = 'simple'
+
+    def stage(self, kind, ids):
+        # the search_document() text of every row, built from the stored
+        # columns and genre rows in one statement
+        if not ids:
+            return
+        table = self.models[kind].__tablename__
+        self.db.session.execute(
+            text(f"UPDATE {table} SET search_vector = to_tsvector(:config, concat_ws(' ', name, city, state, "
+                 f"(SELECT string_agg(g.name, ' ') FROM {table}_genre g WHERE g.{table}_id = {table}.id))) "
+                 f"WHERE id = ANY(:ids)"),
+            {'config': self.config, 'ids': list(ids)}
+        )
+
+    def remove(self, kind, entity_id):
+        # the vector lives on the row itself and goes away with it
+        pass
+
+    def search(self, kind, term):
+        tokens = tokenize(term)
+        if not tokens:
+            return None
+        table = self.models[kind].__tablename__
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        rows = self.db.session.execute(
+            text(f'SELECT id FROM {table}, to_tsquery(:config, :query) query '
+                 f'WHERE search_vector @@ query '
+                 f'ORDER BY ts_rank(search_vector, query) DESC, name LIMIT :limit'),
+            {'config': self.config, 'query': query, 'limit': self.limit}
+        )
+        return [row.id for row in rows]
+
+
+class InMemorySearchBackend(SearchBackend):
+    '''
+    In-process inverted index for SQLite and tests. Each kind is loaded from
+    the database on first search and then kept current by publish()/remove().
+    Prefix matches are found by bisecting a sorted vocabulary.
+    '''
+    def __init__(self, db, models, limit=100):
+        super().__init__(db, models, limit)
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def _index(self, kind):
+        index = self.indexes.get(kind)
+        if index is None:
+            index = {'postings': {}, 'documents': {}, 'vocabulary': []}
+            for entity in self.models[kind].query.all():
+                self._add(index, entity)
+            self.indexes[kind] = index
+        return index
+
+    def _add(self, index, entity):
+        tokens = tokenize(search_document(entity))
+        index['documents'][entity.id] = (tokens, entity.name or '')
+        for token in set(tokens):
+            postings = index['postings'].setdefault(token, set())
+            if not postings:
+                vocabulary = index['vocabulary']
+                vocabulary.insert(bisect_left(vocabulary, token), token)
+            postings.add(entity.id)
+
+    def _discard(self, index, entity_id):
+        document = index['documents'].pop(entity_id, None)
+        if document is None:
+            return
+        for token in set(document[0]):
+            postings = index['postings'][token]
+            postings.discard(entity_id)
+            if not postings:
+                del index['postings'][token]
+                vocabulary = index['vocabulary']
+                del vocabulary[bisect_left(vocabulary, token)]
+
+    def publish(self, kind, ids):
+        # reads the committed rows back, unless the kind is not loaded yet
+        if kind not in self.indexes or not ids:
+            return
+        model = self.models[kind]
+        entities = model.query.filter(model.id.in_(ids)).all()
+        with self.lock:
+            index = self.indexes[kind]
+            for entity_id in ids:
+                self._discard(index, entity_id)
+            for entity in entities:
+                self._add(index, entity)
+
+    def remove(self, kind, entity_id):
+        with self.lock:
+            if kind in self.indexes:
+                self._discard(self.indexes[kind], entity_id)
+
+    def search(self, kind, term):
+        tokens = tokenize(term)
+        if not tokens:
+            return None
+        with self.lock:
+            index = self._index(kind)
+            vocabulary = index['vocabulary']
+            matches = None
+            for token in tokens:
+                ids = set()
+                i = bisect_left(vocabulary, token)
+                while i < len(vocabulary) and vocabulary[i].startswith(token):
+                    ids |= index['postings'][vocabulary[i]]
+                    i += 1
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+
+            def rank(entity_id):
+                # exact token hits outrank prefix-only hits, then by name
+                document_tokens, name = index['documents'][entity_id]
+                exact = sum(document_tokens.count(token) for token in tokens)
+                return (-exact, name.lower())
+
+            return sorted(matches, key=rank)[:self.limit]
+
+
+def make_search_backend(db, models, backend='auto', limit=100):
+    if backend == 'auto':
+        backend = 'postgres' if db.engine.url.get_backend_name() == 'postgresql' else 'memory'
+    if backend == 'postgres':
+        return PostgresSearchBackend(db, models, limit)
+    return InMemorySearchBackend(db, models, limit)
+
+
+class LazySearchBackend:
+    '''
+    Stands in for the backend returned by factory, which is only called on
+    first use, so importing the app does not open a database connection.
+    '''
+    def __init__(self, factory):
+        self.factory = factory
+        self.backend = None
+        self.lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self.backend is None:
+            with self.lock:
+                if self.backend is None:
+                    self.backend = self.factory()
+        return getattr(self.backend, name)
@@ -0,0 +1,121 @@
+import logging
+import threading
+import time
+from sqlalchemy import text
+
+
+logger = logging.getLogger(__name__)
+
+#----------------------------------------------------------------------------#
+# Refresh.
+#----------------------------------------------------------------------------#
+
+# Recomputes, from show_list, the rows of <kind>_stats whose next show has
+# started. The show_list triggers (migrations/versions/e7f3a91c5d20_.py)
+# keep the counts current as shows are inserted, updated and deleted; what
+# they cannot follow is time passing, which moves shows from upcoming to
+# past. Like the pages, a show is upcoming while start_time >= now().
+REFRESH_SQL = '''
+UPDATE {kind}_stats s SET
+    upcoming_shows_count = coalesce(a.upcoming, 0),
+    past_shows_count = coalesce(a.past, 0),
+    next_show_time = a.next_show_time
+FROM {kind}_stats d LEFT JOIN (
+    SELECT {kind}_id,
+           count(*) FILTER (WHERE start_time >= now()) AS upcoming,
+           count(*) FILTER (WHERE start_time < now()) AS past,
+           min(start_time) FILTER (WHERE start_time >= now()) AS next_show_time
+    FROM show_list
+    WHERE {kind}_id IN (SELECT {kind}_id FROM {kind}_stats WHERE next_show_time < now())
+    GROUP BY {kind}_id
+) a ON a.{kind}_id = d.{kind}_id
+WHERE s.{kind}_id = d.{kind}_id AND d.next_show_time < now()
+RETURNING s.{kind}_id
+'''
+
+# Rebuilds <kind>_stats from scratch, one row per entity with shows.
+REBUILD_SQL = '''
+INSERT INTO {kind}_stats ({kind}_id, upcoming_shows_count, past_shows_count, next_show_time)
+SELECT {kind}_id,
+       count(*) FILTER (WHERE start_time >= now()),
+       count(*) FILTER (WHERE start_time < now()),
+       min(start_time) FILTER (WHERE start_time >= now())
+FROM show_list GROUP BY {kind}_id
+ON CONFLICT ({kind}_id) DO UPDATE SET
+    upcoming_shows_count = EXCLUDED.upcoming_shows_count,
+    past_shows_count = EXCLUDED.past_shows_count,
+    next_show_time = EXCLUDED.next_show_time
+'''
+
+KINDS = ('venue', 'artist')
+
+
+def refresh_due(db):
+    '''
+    Recomputes the stats rows whose next show has started and returns
+    {kind: [ids]} of the rows that changed.
+    '''
+    refreshed = {}
+    for kind in KINDS:
+        rows = db.session.execute(text(REFRESH_SQL.format(kind=kind)))
+        refreshed[kind] = [row[0] for row in rows]
+    db.session.commit()
+    return refreshed
+
+
+def rebuild(db):
+    # also drops rows left for entities that no longer have shows
+    for kind in KINDS:
+        db.session.execute(text(
+            f'DELETE FROM {kind}_stats WHERE {kind}_id NOT IN (SELECT {kind}_id FROM show_list)'
+        ))
+        db.session.execute(text(REBUILD_SQL.format(kind=kind)))
+    db.session.commit()
+
+
+#----------------------------------------------------------------------------#
+# Background refresher.
+#----------------------------------------------------------------------------#
+
+class StatsRefresher:
+    '''
+    Daemon thread running refresh_due() every interval seconds inside an
+    app context. on_refresh is called with the changed {kind: [ids]} so
+    cached pages can be invalidated. start() is idempotent.
+    '''
+    def __init__(self, app, db, interval=60, on_refresh=None):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self.on_refresh = on_refresh
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        if self.interval <= 0 or (self.thread is not None and self.thread.is_alive()):
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+
+    def refresh(self):
+        with self.app.app_context():
+            try:
+                refreshed = refresh_due(self.db)
+            except Exception:
+                self.db.session.rollback()
+                raise
+            finally:
+                self.db.session.remove()
+        if self.on_refresh and any(refreshed.values()):
+            self.on_refresh(refreshed)
+        return refreshed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception('show stats refresh failed')
@@ -1,28 +1,67 @@
 import os
-from flask import Flask, request, abort, jsonify
+import sys
+import click
+from flask import Flask, request, abort, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
 
-from models import setup_db, Question, Category
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+
+from models import setup_db, db, Question, category_registry, question_counter
+from .quiz import QuestionIndex, QuizSessions, make_session_store
+from .bulk import read_rows, import_questions, export_questions, DEFAULT_CHUNK_SIZE
+from .search import make_question_search
+from .profiler import QueryProfiler
 
 QUESTIONS_PER_PAGE = 10  # defined how many questions per page as constants 
 
 '''
-to split question into pages. will take the request and the entire questions
+to split question into pages. will take the request and a questions query
+ordered by id; only the rows of the requested page are fetched and formatted.
+?after=<id> resumes after the last question seen (keyset), otherwise ?page=n
 '''
-def paginated_questions(request, questions):
-  page = request.args.get('page', 1, type=int)
-  start =  (page - 1) * QUESTIONS_PER_PAGE
-  end = start + QUESTIONS_PER_PAGE
-  questions_formated = [question.format() for question in questions]
-  current_questions = questions_formated[start:end]
-  return current_questions
+def paginated_questions(request, selection):
+  after = request.args.get('after', None, type=int)
+  if after is not None:
+    selection = selection.filter(Question.id > after)
+  else:
+    page = max(request.args.get('page', 1, type=int), 1)
+    selection = selection.offset((page - 1) * QUESTIONS_PER_PAGE)
+  questions = selection.limit(QUESTIONS_PER_PAGE).all()
+  return [question.format() for question in questions]
+
+'''
+the page of a category's questions and the category's question count in
+one query: the count is a window over the category's rows (served by the
+ix_questions_category_id index) taken before the page or ?after cursor
+is applied
+'''
+def paginated_category(request, category_id):
+  in_category = db.session.query(
+    Question, func.count().over().label('total')
+  ).filter(Question.category == category_id).subquery()
+  question = aliased(Question, in_category)
+  selection = db.session.query(question, in_category.c.total).order_by(in_category.c.id)
+  after = request.args.get('after', None, type=int)
+  if after is not None:
+    selection = selection.filter(in_category.c.id > after)
+  else:
+    page = max(request.args.get('page', 1, type=int), 1)
+    selection = selection.offset((page - 1) * QUESTIONS_PER_PAGE)
+  rows = selection.limit(QUESTIONS_PER_PAGE).all()
+  return [row[0].format() for row in rows], rows[0].total if rows else 0
 
 def create_app(test_config=None):
   # create and configure the app
   app = Flask(__name__)
   setup_db(app)
+  QueryProfiler(app)
+  question_index = QuestionIndex()
+  quiz_sessions = QuizSessions(question_index, make_session_store(
+    os.environ.get('QUIZ_SESSION_STORE', 'memory'), os.environ.get('QUIZ_SESSION_URL')
+  ))
+  question_search = make_question_search()
   
   # Set up CORS. Allow '*' for origins.
   CORS(app, resources={r"/api/*": {"origins": "*"}})
@@ -43,32 +82,35 @@ def create_app(test_config=None):
 
   @app.route('/categories')
   def retrieve_categories():
-    categories = Category.query.order_by(Category.id).all()
+    categories, etag = category_registry.load()
     if len(categories) == 0:
       abort(404)
-    return jsonify({ 
+    if etag in request.if_none_match:
+      response = Response(status=304)
+      response.set_etag(etag)
+      return response
+    response = jsonify({ 
       "success": True, 
       'total_categories': len(categories),
-      "categories": {category.id: category.type for category in categories},
+      "categories": categories,
       })
+    response.set_etag(etag)
+    return response
 
 #---------------------------------------------------------------
 # 2 - Retrieve Questions
 #---------------------------------------------------------------
   @app.route('/questions')
   def retrieve_questions():
-    questions = Question.query.order_by(Question.id).all()
-    current_questions = paginated_questions(request, questions)
+    current_questions = paginated_questions(request, Question.query.order_by(Question.id))
 
     if len(current_questions) == 0:
       abort(404)
-    categories = Category.query.order_by(Category.id).all()
-    
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(Question.query.all()),
-      "categories": {category.id: category.type for category in categories},
+      'total_questions': question_counter.total(),
+      "categories": category_registry.map(),
       "current_category": None
     })
 
@@ -84,13 +126,14 @@ def create_app(test_config=None):
         abort(404)
 
       deleted_question.delete()
-      questions = Question.query.order_by(Question.id).all()
-      current_questions = paginated_questions(request, questions)
+      question_index.remove(deleted_id)
+      question_search.remove(deleted_id)
+      current_questions = paginated_questions(request, Question.query.order_by(Question.id))
       return jsonify({
         'success': True,
         'deleted_id': deleted_id,
         'questions': current_questions,
-        'total_questions': len(Question.query.all()),
+        'total_questions': question_counter.total(),
       })
     except:
       abort(422)
@@ -115,13 +158,13 @@ def create_app(test_config=None):
         ).filter(
           Question.question.ilike(
             '%{}%'.format(searchTerm))
-        ).all()
+        )
         current_questions = paginated_questions(request, search_results)
 
         return jsonify({
           'success': True,
           'questions': current_questions,
-          'total_questions': len(current_questions),
+          'total_questions': search_results.order_by(None).count(),
           'current_category': None
         })
       else:
@@ -132,38 +175,102 @@ def create_app(test_config=None):
           difficulty=new_difficulty
         )
         question.insert()
+        question_index.add(question)
+        question_search.add(question)
 
         return jsonify({
           'success': True,
           'created_id': question.id,
-          'total_questions': len(Question.query.all())
+          'total_questions': question_counter.total()
         })
 
     except:
       abort(400)
 
+#---------------------------------------------------------------
+# Ranked search for Questions
+#---------------------------------------------------------------
+  @app.route('/questions/search')
+  def search_questions():
+    term = request.args.get('q', '')
+    category = request.args.get('category', None, type=int)
+    page = max(request.args.get('page', 1, type=int), 1)
+    if not term.strip():
+      abort(400)
+    questions, total = question_search.search(
+      term, category,
+      limit=QUESTIONS_PER_PAGE, offset=(page - 1) * QUESTIONS_PER_PAGE
+    )
+    return jsonify({
+      'success': True,
+      'questions': questions,
+      'total_questions': total,
+      'current_category': category_registry.map().get(category)
+    })
+
+#---------------------------------------------------------------
+# Bulk import & export of Questions
+#---------------------------------------------------------------
+  def imported(report):
+    if report['inserted']:
+      question_counter.reconcile()
+      question_index.invalidate()
+      question_search.invalidate()
+    return report
+
+  @app.route('/questions/bulk', methods=['POST'])
+  def bulk_import_questions():
+    format = request.args.get('format', 'csv' if request.mimetype == 'text/csv' else 'jsonl')
+    chunk_size = request.args.get('chunk_size', DEFAULT_CHUNK_SIZE, type=int)
+    if format not in ('jsonl', 'csv') or chunk_size < 1:
+      abort(400)
+    lines = (line.decode('utf-8') for line in request.stream)
+    report = imported(import_questions(read_rows(lines, format), chunk_size))
+    return jsonify(dict(report, success=report['rejected'] == 0))
+
+  @app.route('/questions/export')
+  def bulk_export_questions():
+    format = request.args.get('format', 'jsonl')
+    if format not in ('jsonl', 'csv'):
+      abort(400)
+    mimetype = 'text/csv' if format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(export_questions(format)), mimetype=mimetype)
+
+  @app.cli.command('import-questions')
+  @click.argument('file', type=click.File('r', encoding='utf-8'))
+  @click.option('--format', type=click.Choice(['jsonl', 'csv']), default='jsonl')
+  @click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE)
+  def import_questions_command(file, format, chunk_size):
+    report = imported(import_questions(read_rows(file, format), chunk_size))
+    for batch in report['batches']:
+      for error in batch['errors']:
+        click.echo('batch {} line {}: {}'.format(batch['batch'], error['line'], error['error']), err=True)
+    click.echo('{} inserted, {} rejected'.format(report['inserted'], report['rejected']))
+
+  @app.cli.command('export-questions')
+  @click.option('--format', type=click.Choice(['jsonl', 'csv']), default='jsonl')
+  def export_questions_command(format):
+    for chunk in export_questions(format):
+      sys.stdout.write(chunk)
+
 #---------------------------------------------------------------
 # 6 - Questions Based on Category
 #---------------------------------------------------------------
   @app.route('/categories/<int:category_id>/questions')
   def retrieve_questions_by_category(category_id):
-    questions = Question.query.order_by(
-      Question.id
-    ).filter(
-      Question.category == category_id
-      ).all()
-    current_questions = paginated_questions(request, questions)
+    categories = category_registry.map()
+    if category_id not in categories:
+      abort(404)
+    current_questions, total_questions = paginated_category(request, category_id)
 
     if len(current_questions) == 0:
       abort(404)
-    categories = Category.query.order_by(Category.id).all()
-    chosen_category = Category.query.filter_by(id=category_id).one_or_none()
     return jsonify({
       'success': True,
       'questions': current_questions,
-      'total_questions': len(Question.query.all()),
-      "categories": {category.id: category.type for category in categories},
-      "current_category": chosen_category.type
+      'total_questions': total_questions,
+      "categories": categories,
+      "current_category": categories[category_id]
     })
 
 #---------------------------------------------------------------
@@ -176,33 +283,13 @@ def create_app(test_config=None):
       previous_questions = body.get('previous_questions', [])
       quiz_category = body.get('quiz_category', None)
       try:
-        if quiz_category['id'] == 0:
-          questions_query = Question.query.filter(
-            Question.id.notin_(previous_questions)
-          ).all()
-        else:
-          questions_query = Question.query.filter_by(
-            category= quiz_category['id']
-          ).filter(
-            Question.id.notin_(previous_questions)
-          ).all()
-        length_of_available_question = len(questions_query)
-        if length_of_available_question > 0:
-          result = {
-            "success": True,
-            "questions": Question.format(
-              questions_query[
-                random.randrange(
-                  0, length_of_available_question
-                )
-              ]
-            ),
-          }
-        else:
-          result = {
-            "success": True,
-            "questions": None
-          }
+        question = question_index.next_question(
+          int(quiz_category['id']), set(previous_questions)
+        )
+        result = {
+          "success": True,
+          "questions": question.format() if question else None,
+        }
         return jsonify(result)
 
       except Exception as e:
@@ -210,6 +297,43 @@ def create_app(test_config=None):
         abort(400)
 
     abort(422)
+
+  '''
+  quiz sessions keep the shuffled questions on the server: create one
+  for a category (0 for all), then ask for the next question each turn
+  '''
+  @app.route("/quizzes/sessions", methods=['POST'])
+  def create_quiz_session():
+    body = request.get_json(silent=True) or {}
+    try:
+      category = int(body['quiz_category']['id'])
+      limit = body.get('limit')
+      limit = int(limit) if limit is not None else None
+    except (KeyError, TypeError, ValueError):
+      abort(400)
+    if limit is not None and limit < 1:
+      abort(400)
+    if category != 0 and category not in category_registry.map():
+      abort(404)
+
+    session_id, total = quiz_sessions.create(category, limit)
+    return jsonify({
+      "success": True,
+      "session_id": session_id,
+      "total_questions": total,
+    }), 201
+
+  @app.route("/quizzes/sessions/<session_id>/next", methods=['POST'])
+  def next_quiz_question(session_id):
+    turn = quiz_sessions.next_question(session_id)
+    if turn is None:
+      abort(404)
+    question, remaining = turn
+    return jsonify({
+      "success": True,
+      "question": question.format() if question else None,
+      "remaining": remaining,
+    })
 #---------------------------------------------------------------
 # 9 - Error Handlers
 #---------------------------------------------------------------
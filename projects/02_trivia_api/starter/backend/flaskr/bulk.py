@@ -0,0 +1,123 @@
+import csv
+import io
+import json
+from itertools import islice
+
+from models import db, Question, category_registry
+
+FIELDS = ('question', 'answer', 'category', 'difficulty')
+DEFAULT_CHUNK_SIZE = 500
+
+
+'''
+read_rows(lines, format)
+    streams (line number, row dict) pairs from an iterable of text lines,
+    either JSON Lines ('jsonl') or CSV with a header row ('csv').
+    Lines that cannot be parsed are yielded as (line number, ValueError)
+'''
+def read_rows(lines, format='jsonl'):
+  if format == 'csv':
+    reader = csv.DictReader(lines)
+    for row in reader:
+      yield reader.line_num, row
+    return
+  for line_number, line in enumerate(lines, 1):
+    if not line.strip():
+      continue
+    try:
+      row = json.loads(line)
+      if not isinstance(row, dict):
+        raise ValueError('expected a JSON object')
+      yield line_number, row
+    except ValueError as e:
+      yield line_number, ValueError(str(e))
+
+
+'''
+validate(row, categories)
+    returns the insertable values of a row, raising ValueError on bad input
+'''
+def validate(row, categories):
+  if isinstance(row, Exception):
+    raise row
+  missing = [field for field in FIELDS if row.get(field) in (None, '')]
+  if missing:
+    raise ValueError('missing ' + ', '.join(missing))
+  category = int(row['category'])
+  if category not in categories:
+    raise ValueError('unknown category {}'.format(category))
+  difficulty = int(row['difficulty'])
+  if not 1 <= difficulty <= 5:
+    raise ValueError('difficulty must be between 1 and 5')
+  return {
+    'question': str(row['question']),
+    'answer': str(row['answer']),
+    'category': category,
+    'difficulty': difficulty,
+  }
+
+
+'''
+import_questions(rows, chunk_size)
+    validates and inserts rows chunk by chunk: each chunk's valid rows go in
+    one executemany INSERT and one commit. Returns a per-batch report;
+    a failed batch is rolled back and reported without stopping the import
+'''
+def import_questions(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+  categories = category_registry.map()
+  rows = iter(rows)
+  report = {'inserted': 0, 'rejected': 0, 'batches': []}
+  while True:
+    chunk = list(islice(rows, chunk_size))
+    if not chunk:
+      break
+    batch = {'batch': len(report['batches']) + 1, 'inserted': 0, 'errors': []}
+    values = []
+    for line_number, row in chunk:
+      try:
+        values.append(validate(row, categories))
+      except (TypeError, ValueError) as e:
+        batch['errors'].append({'line': line_number, 'error': str(e)})
+    if values:
+      try:
+        db.session.execute(Question.__table__.insert(), values)
+        db.session.commit()
+        batch['inserted'] = len(values)
+      except Exception as e:
+        db.session.rollback()
+        batch['errors'].append({'line': None, 'error': 'batch rolled back: {}'.format(e)})
+    report['inserted'] += batch['inserted']
+    report['rejected'] += len(chunk) - batch['inserted']
+    report['batches'].append(batch)
+  return report
+
+
+'''
+export_questions(format, chunk_size)
+    streams every question as JSON Lines or CSV text, fetching chunk_size
+    rows at a time instead of loading the table
+'''
+def export_questions(format='jsonl', chunk_size=DEFAULT_CHUNK_SIZE):
+  query = db.session.query(
+    Question.id, Question.question, Question.answer, Question.category, Question.difficulty
+  ).order_by(Question.id).yield_per(chunk_size)
+  if format == 'csv':
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('id',) + FIELDS)
+    for row in query:
+      writer.writerow((row.id, row.question, row.answer, row.category, row.difficulty))
+      if buffer.tell() > 64 * 1024:
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+    return
+  for row in query:
+    yield json.dumps({
+      'id': row.id,
+      'question': row.question,
+      'answer': row.answer,
+      'category': row.category,
+      'difficulty': row.difficulty,
+    }) + '\n'
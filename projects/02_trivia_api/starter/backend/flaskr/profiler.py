@@ -0,0 +1,198 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from flask import g, has_request_context, jsonify, request, template_rendered, before_render_template
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# A copy of projects/01_fyyur/starter_code/profiler.py, the source of truth
+# for the query profiler: change that file first and carry the change over
+# here (and to the other copy), keeping this project's indentation. A test
+# compares this file's code with the source and fails when they drift.
+
+logger = logging.getLogger('query_profiler')
+
+
+def normalize(statement):
+  # statements are already parameterized; collapse whitespace so the same
+  # query built in different places compares equal
+  return re.sub(r'\s+', ' ', statement).strip()
+
+
+def setting(app, name, default):
+  # a flag from the app config, else the environment, else default;
+  # strings such as '0' or 'off' read as false
+  value = app.config.get(name, os.environ.get(name))
+  if value is None:
+    return default
+  if isinstance(value, str):
+    return value.lower() not in ('', '0', 'false', 'no', 'off')
+  return bool(value)
+
+
+'''
+RequestProfile
+    Queries and template renders of one request. A statement repeated with
+    the same parameters is a duplicate; one repeated n_plus_one_threshold
+    times or more with different parameters is a likely N+1.
+'''
+class RequestProfile:
+  def __init__(self, n_plus_one_threshold=5):
+    self.n_plus_one_threshold = n_plus_one_threshold
+    self.started = time.perf_counter()
+    self.queries = 0
+    self.db_time = 0.0
+    self.rows = 0
+    self.statements = Counter()
+    self.executions = Counter()
+    self.template_time = 0.0
+    self.template_started = []
+
+  def record(self, statement, parameters, duration, rowcount):
+    statement = normalize(statement)
+    self.queries += 1
+    self.db_time += duration
+    if rowcount and rowcount > 0:
+      self.rows += rowcount
+    self.statements[statement] += 1
+    try:
+      self.executions[(statement, repr(parameters))] += 1
+    except Exception:
+      pass
+
+  def summary(self, status=None):
+    duplicates = sum(count - 1 for count in self.executions.values() if count > 1)
+    repeated = Counter()
+    for (statement, _), count in self.executions.items():
+      repeated[statement] += 1
+    n_plus_one = [
+      {'statement': statement, 'count': self.statements[statement], 'distinct_parameters': variants}
+      for statement, variants in repeated.most_common()
+      if self.statements[statement] >= self.n_plus_one_threshold and variants > 1
+    ]
+    return {
+      'method': request.method,
+      'path': request.path,
+      'status': status,
+      'duration_ms': round((time.perf_counter() - self.started) * 1000, 2),
+      'queries': self.queries,
+      'db_time_ms': round(self.db_time * 1000, 2),
+      'rows': self.rows,
+      'duplicate_queries': duplicates,
+      'n_plus_one': n_plus_one,
+      'template_ms': round(self.template_time * 1000, 2),
+    }
+
+
+# engine-wide listeners, registered once; they only record while a
+# profiled request is active on this thread
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  if has_request_context() and g.get('query_profile') is not None:
+    conn.info.setdefault('query_profiler_started', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  if not has_request_context() or g.get('query_profile') is None:
+    return
+  started = conn.info.get('query_profiler_started')
+  if not started:
+    return
+  duration = time.perf_counter() - started.pop()
+  g.query_profile.record(statement, parameters, duration, getattr(cursor, 'rowcount', None))
+
+
+'''
+QueryProfiler
+    Flask extension timing every SQL statement and template render of a
+    request, through SQLAlchemy engine events and Flask's template signals.
+    Each profile is
+      - summarized in the X-Query-Profile response header,
+      - logged as one JSON line on the query_profiler logger (a warning
+       when an N+1 pattern is flagged),
+      - kept among the last `history` profiles, served at /_profiler
+        when QUERY_PROFILER_ENDPOINT is set.
+    It is on when QUERY_PROFILER is set in the app config or environment,
+    or when the app runs in debug mode. The endpoint exposes the SQL and
+    paths of recent requests, so debug mode alone does not register it.
+
+    EXAMPLE
+      profiler = QueryProfiler(app)
+'''
+class QueryProfiler:
+  header = 'X-Query-Profile'
+
+  def __init__(self, app=None, history=100, n_plus_one_threshold=5):
+    self.history = deque(maxlen=history)
+    self.lock = threading.Lock()
+    self.n_plus_one_threshold = n_plus_one_threshold
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if not setting(app, 'QUERY_PROFILER', app.debug):
+      return
+
+    if not event.contains(Engine, 'before_cursor_execute', before_cursor_execute):
+      event.listen(Engine, 'before_cursor_execute', before_cursor_execute)
+      event.listen(Engine, 'after_cursor_execute', after_cursor_execute)
+    try:
+      before_render_template.connect(self._before_render, app)
+      template_rendered.connect(self._after_render, app)
+    except RuntimeError:
+      # signals need blinker; without it template time stays 0
+      pass
+    app.before_request(self._start)
+    app.after_request(self._finish)
+    if setting(app, 'QUERY_PROFILER_ENDPOINT', False):
+      app.add_url_rule('/_profiler', 'query_profiler', self.report)
+
+  def _start(self):
+    g.query_profile = RequestProfile(self.n_plus_one_threshold)
+
+  def _before_render(self, sender, template, context, **extra):
+    profile = g.get('query_profile')
+    if profile is not None:
+      profile.template_started.append(time.perf_counter())
+
+  def _after_render(self, sender, template, context, **extra):
+    profile = g.get('query_profile')
+    if profile is not None and profile.template_started:
+      profile.template_time += time.perf_counter() - profile.template_started.pop()
+
+  def _finish(self, response):
+    profile = g.pop('query_profile', None)
+    if profile is None or request.endpoint == 'query_profiler':
+      return response
+    summary = profile.summary(response.status_code)
+    response.headers[self.header] = (
+      f"queries={summary['queries']}; db={summary['db_time_ms']}ms; rows={summary['rows']}; "
+      f"duplicates={summary['duplicate_queries']}; n+1={len(summary['n_plus_one'])}; "
+      f"template={summary['template_ms']}ms"
+    )
+    with self.lock:
+      self.history.append(summary)
+    if summary['n_plus_one']:
+      logger.warning(json.dumps(summary))
+    else:
+      logger.info(json.dumps(summary))
+    return response
+
+  def report(self):
+    with self.lock:
+      profiles = list(self.history)
+    flagged = Counter()
+    for profile in profiles:
+      for pattern in profile['n_plus_one']:
+        flagged[(profile['method'] + ' ' + profile['path'], pattern['statement'])] += 1
+    return jsonify({
+      'requests': profiles,
+      'n_plus_one': [
+        {'endpoint': endpoint, 'statement': statement, 'requests': count}
+        for (endpoint, statement), count in flagged.most_common()
+      ],
+    })
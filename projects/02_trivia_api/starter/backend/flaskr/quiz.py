@@ -0,0 +1,312 @@
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+
+from models import db, Question
+
+ALL_CATEGORIES = 0
+
+
+'''
+IdPool
+    a set of question ids that supports O(1) add, remove and random choice:
+    ids are kept in a list, with each id's position tracked for swap-removal
+'''
+class IdPool:
+  def __init__(self):
+    self.ids = []
+    self.positions = {}
+
+  def __len__(self):
+    return len(self.ids)
+
+  def add(self, question_id):
+    if question_id not in self.positions:
+      self.positions[question_id] = len(self.ids)
+      self.ids.append(question_id)
+
+  def remove(self, question_id):
+    position = self.positions.pop(question_id, None)
+    if position is None:
+      return
+    last = self.ids.pop()
+    if last != question_id:
+      self.ids[position] = last
+      self.positions[last] = position
+
+  def choice(self):
+    return random.choice(self.ids)
+
+
+'''
+QuestionIndex
+    in-memory index of question ids per category (plus ALL_CATEGORIES),
+    loaded with one (id, category) query and reloaded after max_age seconds
+    so inserts made by other workers show up. The quiz only touches the
+    questions table to fetch the chosen question by primary key.
+'''
+class QuestionIndex:
+  def __init__(self, max_age=300, max_attempts=32):
+    self.max_age = max_age
+    self.max_attempts = max_attempts
+    self.lock = threading.Lock()
+    self.pools = None
+    self.loaded_at = 0
+
+  def _pools(self):
+    if self.pools is None or time.monotonic() - self.loaded_at > self.max_age:
+      pools = {ALL_CATEGORIES: IdPool()}
+      for question_id, category in db.session.query(Question.id, Question.category):
+        pools[ALL_CATEGORIES].add(question_id)
+        if category is not None:
+          pools.setdefault(int(category), IdPool()).add(question_id)
+      self.pools = pools
+      self.loaded_at = time.monotonic()
+    return self.pools
+
+  def add(self, question):
+    with self.lock:
+      if self.pools is not None:
+        self.pools[ALL_CATEGORIES].add(question.id)
+        if question.category is not None:
+          self.pools.setdefault(int(question.category), IdPool()).add(question.id)
+
+  def remove(self, question_id):
+    with self.lock:
+      if self.pools is not None:
+        for pool in self.pools.values():
+          pool.remove(question_id)
+
+  def invalidate(self):
+    with self.lock:
+      self.pools = None
+
+  def ids(self, category):
+    with self.lock:
+      pool = self._pools().get(category)
+      return list(pool.ids) if pool else []
+
+  def sample(self, category, excluded):
+    '''
+    a random id in category that is not in the excluded set, or None.
+    Rejection sampling answers in expected constant time while most of the
+    category is still eligible; only a nearly exhausted category falls back
+    to scanning its ids.
+    '''
+    with self.lock:
+      pool = self._pools().get(category)
+      if not pool:
+        return None
+      for _ in range(self.max_attempts):
+        question_id = pool.choice()
+        if question_id not in excluded:
+          return question_id
+      remaining = [question_id for question_id in pool.ids if question_id not in excluded]
+      return random.choice(remaining) if remaining else None
+
+  def next_question(self, category, excluded):
+    '''
+    the Question for a random eligible id, skipping ids whose rows were
+    deleted by another worker since the index was loaded
+    '''
+    while True:
+      question_id = self.sample(category, excluded)
+      if question_id is None:
+        return None
+      question = Question.query.get(question_id)
+      if question is not None:
+        return question
+      self.remove(question_id)
+
+
+'''
+InProcessSessionStore
+    quiz sessions held in this process: each session is a deque of
+    remaining question ids, popped from the left in O(1). At most maxsize
+    sessions are kept, evicting the least recently used, and a session
+    untouched for ttl seconds expires
+'''
+class InProcessSessionStore:
+  def __init__(self, maxsize=10000, ttl=3600):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.lock = threading.Lock()
+    self.sessions = OrderedDict()
+
+  def create(self, session_id, question_ids):
+    with self.lock:
+      self.sessions[session_id] = (deque(question_ids), time.monotonic() + self.ttl)
+      while len(self.sessions) > self.maxsize:
+        self.sessions.popitem(last=False)
+
+  def _session(self, session_id):
+    entry = self.sessions.get(session_id)
+    if entry is None:
+      return None
+    if entry[1] <= time.monotonic():
+      del self.sessions[session_id]
+      return None
+    self.sessions[session_id] = (entry[0], time.monotonic() + self.ttl)
+    self.sessions.move_to_end(session_id)
+    return entry[0]
+
+  def pop(self, session_id):
+    '''
+    (next question id or None when the session is used up, ids remaining
+    after it), or None for an unknown or expired session
+    '''
+    with self.lock:
+      remaining = self._session(session_id)
+      if remaining is None:
+        return None
+      return (remaining.popleft() if remaining else None), len(remaining)
+
+  def delete(self, session_id):
+    with self.lock:
+      self.sessions.pop(session_id, None)
+
+
+'''
+LocalKeyValueStore
+    an in-process stand-in for the redis list commands used by
+    KeyValueSessionStore, for development and tests without a server
+'''
+class LocalKeyValueStore:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.lists = {}
+
+  def _list(self, key):
+    entry = self.lists.get(key)
+    if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+      del self.lists[key]
+      return None
+    return entry
+
+  def rpush(self, key, *values):
+    with self.lock:
+      entry = self._list(key)
+      if entry is None:
+        entry = self.lists[key] = [deque(), None]
+      entry[0].extend(str(value).encode() for value in values)
+      return len(entry[0])
+
+  def lpop(self, key):
+    with self.lock:
+      entry = self._list(key)
+      return entry[0].popleft() if entry and entry[0] else None
+
+  def llen(self, key):
+    with self.lock:
+      entry = self._list(key)
+      return len(entry[0]) if entry else 0
+
+  def exists(self, key):
+    with self.lock:
+      return int(self._list(key) is not None)
+
+  def expire(self, key, seconds):
+    with self.lock:
+      entry = self._list(key)
+      if entry is not None:
+        entry[1] = time.monotonic() + seconds
+      return int(entry is not None)
+
+  def delete(self, *keys):
+    with self.lock:
+      return sum(1 for key in keys if self.lists.pop(key, None) is not None)
+
+
+'''
+KeyValueSessionStore
+    quiz sessions kept in redis (or LocalKeyValueStore) so every worker
+    sees them: each session is a list of remaining ids plus a marker key,
+    since redis drops a list once it is empty. Turns are LPOP + LLEN.
+'''
+class KeyValueSessionStore:
+  def __init__(self, client, ttl=3600, namespace='trivia:quiz:'):
+    self.client = client
+    self.ttl = ttl
+    self.namespace = namespace
+
+  def create(self, session_id, question_ids):
+    ids_key, marker_key = self.namespace + session_id, self.namespace + session_id + ':open'
+    self.client.rpush(marker_key, 1)
+    if question_ids:
+      self.client.rpush(ids_key, *question_ids)
+    self.client.expire(ids_key, self.ttl)
+    self.client.expire(marker_key, self.ttl)
+
+  def pop(self, session_id):
+    ids_key, marker_key = self.namespace + session_id, self.namespace + session_id + ':open'
+    if not self.client.exists(marker_key):
+      return None
+    question_id = self.client.lpop(ids_key)
+    self.client.expire(ids_key, self.ttl)
+    self.client.expire(marker_key, self.ttl)
+    return (int(question_id) if question_id is not None else None), self.client.llen(ids_key)
+
+  def delete(self, session_id):
+    self.client.delete(self.namespace + session_id, self.namespace + session_id + ':open')
+
+
+'''
+make_session_store(backend, url)
+    'memory' keeps sessions in this process; 'kv' keeps them in the redis
+    server at url, or in a LocalKeyValueStore when no url is given
+'''
+def make_session_store(backend='memory', url=None):
+  if backend == 'kv':
+    if url:
+      import redis
+      return KeyValueSessionStore(redis.Redis.from_url(url))
+    return KeyValueSessionStore(LocalKeyValueStore())
+  return InProcessSessionStore()
+
+
+'''
+QuizSessions
+    server-side quiz state: a session is a shuffled sequence of the
+    category's question ids taken from the QuestionIndex, so a turn pops
+    the next id and fetches that one question by primary key instead of
+    the client resending every previous question
+'''
+class QuizSessions:
+  def __init__(self, index, store):
+    self.index = index
+    self.store = store
+
+  def create(self, category, limit=None):
+    '''
+    (session id, number of questions) for a new session over the
+    category, cut to limit questions when a limit of 1 or more is given
+    '''
+    if limit is not None and limit < 1:
+      raise ValueError('limit must be at least 1')
+    question_ids = self.index.ids(category)
+    random.shuffle(question_ids)
+    if limit is not None:
+      question_ids = question_ids[:limit]
+    session_id = secrets.token_urlsafe(16)
+    self.store.create(session_id, question_ids)
+    return session_id, len(question_ids)
+
+  def next_question(self, session_id):
+    '''
+    (Question or None when the session is used up, questions remaining),
+    or None for an unknown session. Ids whose rows were deleted since the
+    session started are skipped
+    '''
+    while True:
+      turn = self.store.pop(session_id)
+      if turn is None:
+        return None
+      question_id, remaining = turn
+      if question_id is None:
+        self.store.delete(session_id)
+        return None, 0
+      question = Question.query.get(question_id)
+      if question is not None:
+        return question, remaining
@@ -0,0 +1,155 @@
+import re
+import threading
+from bisect import bisect_left
+
+from sqlalchemy import text
+
+from models import db, Question
+
+
+def tokenize(value):
+  return re.findall(r'\w+', (value or '').lower())
+
+
+'''
+PostgresQuestionSearch
+    ranked full-text search over question and answer text, served by the
+    ix_questions_search GIN expression index (see migrations/). The WHERE
+    expression must stay identical to the indexed one for the index to apply
+'''
+class PostgresQuestionSearch:
+  DOCUMENT = "to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, ''))"
+
+  def add(self, question):
+    pass
+
+  def remove(self, question_id):
+    pass
+
+  def invalidate(self):
+    pass
+
+  def search(self, term, category=None, limit=10, offset=0):
+    tokens = tokenize(term)
+    if not tokens:
+      return [], 0
+    sql = (
+      'SELECT id, question, answer, category, difficulty, count(*) OVER () AS total '
+      "FROM questions, to_tsquery('english', :query) query "
+      'WHERE {document} @@ query {category} '
+      'ORDER BY ts_rank({document}, query) DESC, id '
+      'LIMIT :limit OFFSET :offset'
+    ).format(
+      document=self.DOCUMENT,
+      category='AND category = :category' if category is not None else ''
+    )
+    rows = db.session.execute(text(sql), {
+      'query': ' & '.join(token + ':*' for token in tokens),
+      'category': category,
+      'limit': limit,
+      'offset': offset,
+    }).fetchall()
+    questions = [{
+      'id': row.id,
+      'question': row.question,
+      'answer': row.answer,
+      'category': row.category,
+      'difficulty': row.difficulty,
+    } for row in rows]
+    return questions, rows[0].total if rows else 0
+
+
+'''
+InMemoryQuestionSearch
+    inverted index over question and answer tokens for SQLite test runs,
+    loaded on first search and kept current by add()/remove(). Prefix
+    matches bisect a sorted vocabulary; only the returned page is loaded
+    from the database
+'''
+class InMemoryQuestionSearch:
+  def __init__(self):
+    self.lock = threading.Lock()
+    self.index = None
+
+  def _load(self):
+    if self.index is None:
+      self.index = {'postings': {}, 'documents': {}, 'vocabulary': []}
+      rows = db.session.query(Question.id, Question.question, Question.answer, Question.category)
+      for row in rows:
+        self._add(row)
+    return self.index
+
+  def _add(self, question):
+    tokens = tokenize(question.question) + tokenize(question.answer)
+    self.index['documents'][question.id] = (tokens, question.category)
+    for token in set(tokens):
+      postings = self.index['postings'].setdefault(token, set())
+      if not postings:
+        vocabulary = self.index['vocabulary']
+        vocabulary.insert(bisect_left(vocabulary, token), token)
+      postings.add(question.id)
+
+  def _remove(self, question_id):
+    document = self.index['documents'].pop(question_id, None)
+    if document is None:
+      return
+    for token in set(document[0]):
+      postings = self.index['postings'][token]
+      postings.discard(question_id)
+      if not postings:
+        del self.index['postings'][token]
+        vocabulary = self.index['vocabulary']
+        del vocabulary[bisect_left(vocabulary, token)]
+
+  def add(self, question):
+    with self.lock:
+      if self.index is not None:
+        self._remove(question.id)
+        self._add(question)
+
+  def remove(self, question_id):
+    with self.lock:
+      if self.index is not None:
+        self._remove(question_id)
+
+  def invalidate(self):
+    with self.lock:
+      self.index = None
+
+  def search(self, term, category=None, limit=10, offset=0):
+    tokens = tokenize(term)
+    if not tokens:
+      return [], 0
+    with self.lock:
+      index = self._load()
+      vocabulary = index['vocabulary']
+      matches = None
+      for token in tokens:
+        ids = set()
+        i = bisect_left(vocabulary, token)
+        while i < len(vocabulary) and vocabulary[i].startswith(token):
+          ids |= index['postings'][vocabulary[i]]
+          i += 1
+        matches = ids if matches is None else matches & ids
+        if not matches:
+          return [], 0
+      if category is not None:
+        matches = {i for i in matches if index['documents'][i][1] == category}
+
+      def rank(question_id):
+        # more token occurrences rank higher, ties by id
+        document_tokens = index['documents'][question_id][0]
+        hits = sum(1 for token in document_tokens if any(token.startswith(t) for t in tokens))
+        return (-hits, question_id)
+
+      page = sorted(matches, key=rank)[offset:offset + limit]
+    questions = {question.id: question for question in Question.query.filter(Question.id.in_(page))} if page else {}
+    return [questions[i].format() for i in page if i in questions], len(matches)
+
+
+def make_question_search():
+  # the dialect name, unlike the URL's backend name, is 'postgresql' for
+  # postgres:// URLs too
+  if db.engine.dialect.name == 'postgresql':
+    return PostgresQuestionSearch()
+  return InMemoryQuestionSearch()
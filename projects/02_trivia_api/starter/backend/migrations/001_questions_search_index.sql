@@ -0,0 +1,4 @@
+-- Full-text index for GET /questions/search (flaskr/search.py).
+-- The indexed expression must match PostgresQuestionSearch.DOCUMENT.
+CREATE INDEX IF NOT EXISTS ix_questions_search ON public.questions
+    USING gin (to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, '')));
@@ -0,0 +1,20 @@
+-- Typed category foreign key and index for GET /categories/<id>/questions.
+-- Databases restored from trivia.psql already have an integer column and
+-- the "category" constraint; older schemas with a text column are converted.
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = 'questions' AND column_name = 'category') <> 'integer' THEN
+        ALTER TABLE public.questions ALTER COLUMN category TYPE integer USING nullif(category, '')::integer;
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint
+                   WHERE conrelid = 'public.questions'::regclass AND contype = 'f') THEN
+        ALTER TABLE public.questions
+            ADD CONSTRAINT category FOREIGN KEY (category) REFERENCES public.categories(id)
+            ON UPDATE CASCADE ON DELETE SET NULL;
+    END IF;
+END
+$$;
+
+CREATE INDEX IF NOT EXISTS ix_questions_category_id ON public.questions (category, id);
@@ -1,7 +1,10 @@
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, create_engine, func, event, DDL
 from flask_sqlalchemy import SQLAlchemy
 import json
+import hashlib
+import threading
+import time
 
 database_name = "trivia"
 database_path = "postgres://{}:{}@{}/{}".format('postgres', '3911986','localhost:5432', database_name)
@@ -25,11 +28,16 @@ Question
 '''
 class Question(db.Model):  
   __tablename__ = 'questions'
+  # category listings filter on category and page by id; existing databases
+  # get the typed column and index from migrations/002_questions_category_index.sql
+  __table_args__ = (
+    Index('ix_questions_category_id', 'category', 'id'),
+  )
 
   id = Column(Integer, primary_key=True)
   question = Column(String)
   answer = Column(String)
-  category = Column(String)
+  category = Column(Integer, ForeignKey('categories.id', onupdate='CASCADE', ondelete='SET NULL'))
   difficulty = Column(Integer)
 
   def __init__(self, question, answer, category, difficulty):
@@ -41,6 +49,7 @@ class Question(db.Model):
   def insert(self):
     db.session.add(self)
     db.session.commit()
+    question_counter.increment()
   
   def update(self):
     db.session.commit()
@@ -48,6 +57,7 @@ class Question(db.Model):
   def delete(self):
     db.session.delete(self)
     db.session.commit()
+    question_counter.increment(-1)
 
   def format(self):
     return {
@@ -58,6 +68,46 @@ class Question(db.Model):
       'difficulty': self.difficulty
     }
 
+# full-text index used by flaskr/search.py; existing databases get it from
+# migrations/001_questions_search_index.sql
+event.listen(Question.__table__, 'after_create', DDL(
+  "CREATE INDEX IF NOT EXISTS ix_questions_search ON questions USING gin "
+  "(to_tsvector('english', coalesce(question, '') || ' ' || coalesce(answer, '')))"
+).execute_if(dialect='postgresql'))
+
+'''
+QuestionCounter
+    the question total kept in memory, so list, create and delete
+    responses get it without counting rows. Question.insert()/delete()
+    adjust it; it is reconciled from one COUNT(*) on first use, after
+    max_age seconds (to pick up other workers' writes) or on reconcile().
+    Category pages count their own rows, see paginated_category()
+'''
+class QuestionCounter:
+  def __init__(self, max_age=300):
+    self.max_age = max_age
+    self.lock = threading.Lock()
+    self.count = None
+    self.loaded_at = 0
+
+  def total(self):
+    with self.lock:
+      if self.count is None or time.monotonic() - self.loaded_at > self.max_age:
+        self.count = db.session.query(func.count(Question.id)).scalar()
+        self.loaded_at = time.monotonic()
+      return self.count
+
+  def increment(self, amount=1):
+    with self.lock:
+      if self.count is not None:
+        self.count = max(self.count + amount, 0)
+
+  def reconcile(self):
+    with self.lock:
+      self.count = None
+
+question_counter = QuestionCounter()
+
 '''
 Category
 
@@ -71,8 +121,60 @@ class Category(db.Model):
   def __init__(self, type):
     self.type = type
 
+  def insert(self):
+    db.session.add(self)
+    db.session.commit()
+    category_registry.invalidate()
+
+  def update(self):
+    db.session.commit()
+    category_registry.invalidate()
+
+  def delete(self):
+    db.session.delete(self)
+    db.session.commit()
+    category_registry.invalidate()
+
   def format(self):
     return {
       'id': self.id,
       'type': self.type
-    }
\ No newline at end of file
+    }
+
+'''
+CategoryRegistry
+    the {id: type} category map, loaded once and served from memory.
+    Category.insert/update/delete invalidate it; max_age bounds how long
+    a worker keeps a map changed by another process. The ETag is derived
+    from the content, so every worker agrees on it.
+'''
+class CategoryRegistry:
+  def __init__(self, max_age=300):
+    self.max_age = max_age
+    self.lock = threading.Lock()
+    self.categories = None
+    self.etag = None
+    self.loaded_at = 0
+
+  def load(self):
+    with self.lock:
+      if self.categories is None or time.monotonic() - self.loaded_at > self.max_age:
+        categories = {
+          category.id: category.type
+          for category in Category.query.order_by(Category.id)
+        }
+        self.etag = hashlib.sha1(
+          json.dumps(categories, sort_keys=True).encode()
+        ).hexdigest()
+        self.categories = categories
+        self.loaded_at = time.monotonic()
+      return self.categories, self.etag
+
+  def map(self):
+    return self.load()[0]
+
+  def invalidate(self):
+    with self.lock:
+      self.categories = None
+
+category_registry = CategoryRegistry()
\ No newline at end of file
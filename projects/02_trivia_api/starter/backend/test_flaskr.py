@@ -1,3 +1,4 @@
+import ast
 import os
 import unittest
 import json
@@ -6,7 +7,8 @@ from flask_sqlalchemy import SQLAlchemy
 
 
 from flaskr import create_app
-from models import setup_db, Question, Category
+from flaskr.search import make_question_search, PostgresQuestionSearch
+from models import setup_db, Question, Category, question_counter
 
 
 class TriviaTestCase(unittest.TestCase):
@@ -51,6 +53,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['total_categories'])
         self.assertTrue(len(Category.query.all()))
 
+#--------- Test conditional GET with the categories ETag => 304
+    def test_304_categories_not_modified(self):
+        res = self.client().get('/categories')
+        etag = res.headers['ETag']
+        self.assertTrue(etag)
+        res = self.client().get('/categories', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
 #--------- Test Invalid Method => error code 405
     def test_405_invalid_method_post_categories(self):
         res = self.client().post('/categories')
@@ -71,6 +82,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertTrue(data['total_questions'])
         self.assertTrue(len(data['questions']))
 
+#--------- Test keyset pagination and database-side totals
+    def test_get_questions_after_cursor(self):
+        res = self.client().get('/questions?after=5')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(all(question['id'] > 5 for question in data['questions']))
+        self.assertLessEqual(len(data['questions']), 10)
+        self.assertEqual(data['total_questions'], Question.query.count())
+
 #--------- Test requesting beyond valid page => error code 404  
     def test_404_sent_requesting_beyond_valid_page(self):
         res = self.client().get('/questions?page=100')
@@ -112,6 +132,40 @@ class TriviaTestCase(unittest.TestCase):
         # self.assertEqual(res.status_code, 200)
         # self.assertEqual(data['success'], True)
 
+#--------- Test that maintained totals follow creates and deletes
+    def test_question_counter_tracks_create_and_delete(self):
+        total = question_counter.total()
+        res = self.client().post('/questions', json=self.new_question)
+        data = json.loads(res.data)
+        self.assertEqual(data['total_questions'], total + 1)
+
+        res = self.client().delete('/questions/{}'.format(data['created_id']))
+        data = json.loads(res.data)
+        self.assertEqual(data['total_questions'], total)
+        question_counter.reconcile()
+        self.assertEqual(question_counter.total(), Question.query.count())
+
+#--------- Test bulk import with a per-row error report, then export
+    def test_bulk_import_and_export_questions(self):
+        lines = '\n'.join([
+            json.dumps({"question": "Bulk question one?", "answer": "One", "difficulty": 1, "category": 1}),
+            json.dumps({"question": "Bulk question two?", "answer": "Two", "difficulty": 2, "category": 99}),
+            'not json',
+        ])
+        res = self.client().post('/questions/bulk?chunk_size=2', data=lines)
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['inserted'], 1)
+        self.assertEqual(data['rejected'], 2)
+        self.assertEqual(len(data['batches']), 2)
+
+        res = self.client().get('/questions/export')
+        exported = [json.loads(line) for line in res.data.decode().splitlines()]
+        self.assertIn('Bulk question one?', [row['question'] for row in exported])
+        Question.query.filter(Question.question == 'Bulk question one?').delete()
+        Question.query.session.commit()
+        question_counter.reconcile()
+
 #--------- Test if question creation method not allowed => error code 405  
     def test_405_if_question_creation_not_allowed(self):
         res = self.client().post('/questions/45', json=self.new_question)
@@ -140,6 +194,31 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['total_questions'], 0)
         self.assertEqual(len(data['questions']), 0)
 
+#--------- Test ranked search with prefix matching and category filter
+    def test_ranked_search_questions(self):
+        res = self.client().get('/questions/search?q=titl')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['total_questions'])
+
+        res = self.client().get('/questions/search?q=lake&category=3')
+        data = json.loads(res.data)
+        self.assertEqual(data['current_category'], 'Geography')
+        self.assertTrue(all(str(q['category']) == '3' for q in data['questions']))
+
+#--------- Test that a Postgres database gets the full-text search backend
+    def test_postgres_search_backend_picked(self):
+        with self.app.app_context():
+            self.assertIsInstance(make_question_search(), PostgresQuestionSearch)
+
+#--------- Test search without a term => error code 400
+    def test_400_ranked_search_without_term(self):
+        res = self.client().get('/questions/search')
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+
 #--------- Test if for Searching Questions without Request Arguments => error code 500
     def test_500_search_question_without_arguments(self):
         res = self.client().post('/questions')
@@ -162,6 +241,15 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(len(data['questions']), 2)
         self.assertEqual(data['current_category'], 'Science')
 
+#--------- Test that the category total counts the whole category, not the page after the cursor
+    def test_get_questions_by_category_after_cursor(self):
+        category_ids = [question.id for question in Question.query.filter(Question.category == 1).order_by(Question.id)]
+        res = self.client().get('/categories/1/questions?after={}'.format(category_ids[0]))
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([question['id'] for question in data['questions']], category_ids[1:])
+        self.assertEqual(data['total_questions'], len(category_ids))
+
 #--------- Test to get questions with wrong category => error code 404  
     def test_404_get_questions_with_wrong_category(self):
         res = self.client().get('/categories/50/questions')
@@ -180,6 +268,21 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+#--------- Test that previous questions are never repeated, then the quiz runs out
+    def test_quiz_excludes_previous_questions(self):
+        category_ids = [question.id for question in Question.query.filter(Question.category == 4)]
+        previous = category_ids[:-1]
+        parameters = {"previous_questions": previous, "quiz_category": {"id": 4}}
+        res = self.client().post("/quizzes", json=parameters)
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['questions']['id'], category_ids[-1])
+
+        parameters = {"previous_questions": category_ids, "quiz_category": {"id": 4}}
+        res = self.client().post("/quizzes", json=parameters)
+        data = json.loads(res.data)
+        self.assertEqual(data['questions'], None)
+
 #--------- Test to get questions without parameters(category and previous questions) => error code 400  
     def test_400_get_question_for_quiz_without_questions(self):
         parameters = {}
@@ -189,6 +292,95 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'bad request')
 
+#--------- Test that a quiz session serves each question of its category once, then runs out
+    def test_quiz_session_serves_each_question_once(self):
+        category_ids = {question.id for question in Question.query.filter(Question.category == 4)}
+        res = self.client().post("/quizzes/sessions", json={"quiz_category": {"id": 4}})
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(data['total_questions'], len(category_ids))
+
+        served = set()
+        for remaining in reversed(range(len(category_ids))):
+            res = self.client().post("/quizzes/sessions/{}/next".format(data['session_id']))
+            turn = json.loads(res.data)
+            self.assertEqual(turn['remaining'], remaining)
+            served.add(turn['question']['id'])
+        self.assertEqual(served, category_ids)
+
+        res = self.client().post("/quizzes/sessions/{}/next".format(data['session_id']))
+        self.assertEqual(json.loads(res.data)['question'], None)
+
+#--------- Test that an unknown quiz session => error code 404
+    def test_404_next_question_for_unknown_session(self):
+        res = self.client().post("/quizzes/sessions/missing/next")
+        data = json.loads(res.data)
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
+#--------- Test quiz session with a limit below 1 => error code 400
+    def test_400_quiz_session_with_limit_below_one(self):
+        for limit in (0, -1):
+            res = self.client().post("/quizzes/sessions", json={"quiz_category": {"id": 4}, "limit": limit})
+            data = json.loads(res.data)
+            self.assertEqual(res.status_code, 400)
+            self.assertEqual(data['success'], False)
+
+#--------- Test that the query profiler reports a request's queries when enabled
+    def test_query_profiler_header(self):
+        os.environ['QUERY_PROFILER'] = os.environ['QUERY_PROFILER_ENDPOINT'] = '1'
+        try:
+            app = create_app()
+        finally:
+            del os.environ['QUERY_PROFILER'], os.environ['QUERY_PROFILER_ENDPOINT']
+        setup_db(app, self.database_path)
+        res = app.test_client().get('/questions')
+        self.assertIn('queries=', res.headers['X-Query-Profile'])
+        report = json.loads(app.test_client().get('/_profiler').data)
+        self.assertEqual(report['requests'][-1]['path'], '/questions')
+
+#--------- Test that the query profiler flags a query repeated with new parameters as N+1
+    def test_query_profiler_flags_n_plus_one(self):
+        os.environ['QUERY_PROFILER'] = os.environ['QUERY_PROFILER_ENDPOINT'] = '1'
+        try:
+            app = create_app()
+        finally:
+            del os.environ['QUERY_PROFILER'], os.environ['QUERY_PROFILER_ENDPOINT']
+        setup_db(app, self.database_path)
+
+        @app.route('/n-plus-one')
+        def n_plus_one():
+            # one lookup per category instead of one query for all of them
+            for category_id in range(1, 7):
+                Category.query.get(category_id)
+            return 'done'
+
+        res = app.test_client().get('/n-plus-one')
+        self.assertIn('n+1=1', res.headers['X-Query-Profile'])
+        report = json.loads(app.test_client().get('/_profiler').data)
+        self.assertEqual(report['n_plus_one'][0]['endpoint'], 'GET /n-plus-one')
+
+#--------- Test that the trivia profiler is the Fyyur source of truth, up to comments, docstrings and indentation
+    def test_query_profiler_matches_source_of_truth(self):
+        backend = os.path.dirname(os.path.abspath(__file__))
+        source = os.path.join(backend, '..', '..', '..', '01_fyyur', 'starter_code', 'profiler.py')
+        self.assertEqual(profiler_code(os.path.join(backend, 'flaskr', 'profiler.py')), profiler_code(source))
+
+
+def profiler_code(path):
+    # the module's AST without docstrings and other bare strings, so copies
+    # that differ only in comments, docstring placement and indentation match
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if isinstance(getattr(node, 'body', None), list):
+            node.body = [
+                statement for statement in node.body
+                if not (isinstance(statement, ast.Expr) and
+                        isinstance(getattr(statement.value, 'value', getattr(statement.value, 's', None)), str))
+            ]
+    return ast.dump(tree)
+
 
 # Make the tests conveniently executable
 if __name__ == "__main__":
@@ -0,0 +1,117 @@
+'''
+benchmark_sqlite.py
+    concurrent read/write benchmark for the SQLite engine profiles
+
+    starts reader and writer processes (like separate Flask workers) against
+    a scratch copy of the drink table and reports completed operations and
+    "database is locked" failures per profile
+
+    EXAMPLE
+        python benchmark_sqlite.py --readers 8 --writers 2 --seconds 10
+        python benchmark_sqlite.py --profiles tuned
+'''
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from src.database.engine import SQLITE_PROFILES, engine_options, apply_pragmas
+
+RECIPE = json.dumps([
+    {'name': 'espresso', 'color': 'brown', 'parts': 1},
+    {'name': 'milk', 'color': 'white', 'parts': 3}
+])
+
+
+def make_engine(path, profile):
+    engine = create_engine('sqlite:///{}'.format(path), **engine_options(profile))
+    apply_pragmas(engine, profile)
+    return engine
+
+
+def prepare(path, profile, drinks):
+    if os.path.exists(path):
+        os.remove(path)
+    engine = make_engine(path, profile)
+    with engine.begin() as connection:
+        connection.execute(text(
+            'CREATE TABLE drink ('
+            'id INTEGER PRIMARY KEY, title VARCHAR(80) UNIQUE, recipe VARCHAR(180) NOT NULL)'
+        ))
+        connection.execute(
+            text('INSERT INTO drink (title, recipe) VALUES (:title, :recipe)'),
+            [{'title': 'drink {}'.format(i), 'recipe': RECIPE} for i in range(drinks)]
+        )
+    engine.dispose()
+
+
+def work(args):
+    path, profile, role, worker, seconds = args
+    engine = make_engine(path, profile)
+    done = locked = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        try:
+            with engine.begin() as connection:
+                if role == 'read':
+                    for row in connection.execute(text('SELECT id, title, recipe FROM drink')):
+                        json.loads(row.recipe)
+                else:
+                    title = 'bench {} {}'.format(worker, done)
+                    connection.execute(
+                        text('INSERT INTO drink (title, recipe) VALUES (:title, :recipe)'),
+                        {'title': title, 'recipe': RECIPE}
+                    )
+                    connection.execute(text('DELETE FROM drink WHERE title = :title'), {'title': title})
+            done += 1
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            locked += 1
+    engine.dispose()
+    return role, done, locked
+
+
+def run(path, profile, readers, writers, seconds, drinks):
+    prepare(path, profile, drinks)
+    jobs = [(path, profile, 'read', i, seconds) for i in range(readers)] + \
+        [(path, profile, 'write', i, seconds) for i in range(writers)]
+    with multiprocessing.Pool(len(jobs)) as pool:
+        results = pool.map(work, jobs)
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for role, done, locked in results:
+        totals[role][0] += done
+        totals[role][1] += locked
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profiles', nargs='+', default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--drinks', type=int, default=50)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix='coffee-bench-')
+    print('{:<8} {:>12} {:>12} {:>12} {:>12}'.format('profile', 'reads/s', 'writes/s', 'read locks', 'write locks'))
+    for profile in args.profiles:
+        path = os.path.join(directory, '{}.db'.format(profile))
+        totals = run(path, profile, args.readers, args.writers, args.seconds, args.drinks)
+        print('{:<8} {:>12.1f} {:>12.1f} {:>12} {:>12}'.format(
+            profile,
+            totals['read'][0] / args.seconds,
+            totals['write'][0] / args.seconds,
+            totals['read'][1],
+            totals['write'][1]
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,20 @@
 import os
+import hashlib
+import threading
+import time
 from flask import Flask, request, jsonify, abort
 from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
-from .auth.auth import AuthError, requires_auth
+from .database.models import db_drop_and_create_all, setup_db, Drink, on_drinks_changed
+from .auth.auth import AuthError, requires_auth, get_token_auth_header, revoke_token
+from .profiler import QueryProfiler
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
+QueryProfiler(app)
 
 '''
 @TODO uncomment the following line to initialize the datbase
@@ -18,61 +23,210 @@ CORS(app)
 '''
 # db_drop_and_create_all()
 
+'''
+MenuSnapshots
+    pre-serialized JSON bodies of the short and long menus, each with a
+    strong ETag, so a menu request is a dict lookup instead of a table scan
+    plus JSON encoding. Snapshots are dropped whenever a drink is inserted,
+    updated or deleted in this process, and rebuilt after max_age seconds
+    so changes made by other workers show up. A snapshot built while a
+    change lands is not kept.
+'''
+class MenuSnapshots:
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.snapshots = {}
+        self.generation = 0
+
+    def get(self, form):
+        snapshot = self.snapshots.get(form)
+        if snapshot is not None and time.monotonic() - snapshot[2] < self.max_age:
+            return snapshot
+        generation = self.generation
+        drinks = Drink.query.order_by(Drink.id).all()
+        body = json.dumps({
+            'success': True,
+            'drinks': [getattr(drink, form)() for drink in drinks]
+        })
+        snapshot = (body, hashlib.sha256(body.encode()).hexdigest(), time.monotonic())
+        with self.lock:
+            if generation == self.generation:
+                self.snapshots[form] = snapshot
+        return snapshot
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.snapshots.clear()
+
+    def response(self, form):
+        '''
+        the menu as a response carrying its ETag; a request whose
+        If-None-Match matches gets 304 Not Modified with no body
+        '''
+        body, etag, _ = self.get(form)
+        response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.no_cache = True
+        if form == 'long':
+            response.cache_control.private = True
+        return response.make_conditional(request)
+
+menu_snapshots = MenuSnapshots()
+on_drinks_changed(menu_snapshots.invalidate)
+
+'''
+recipe_items(recipe)
+    the recipe from a request body as a list of ingredients, each with a
+    non-empty name and color and a positive number of parts; a single
+    ingredient may be sent as a bare object. Anything else aborts with 422
+    before the drink is written, so a malformed recipe never reaches the
+    database or the recipe projections.
+'''
+def recipe_items(recipe):
+    if isinstance(recipe, dict):
+        recipe = [recipe]
+    if not isinstance(recipe, list) or not recipe:
+        abort(422)
+    for item in recipe:
+        if not isinstance(item, dict):
+            abort(422)
+        if not all(isinstance(item.get(key), str) and item[key] for key in ('name', 'color')):
+            abort(422)
+        parts = item.get('parts')
+        if isinstance(parts, bool) or not isinstance(parts, (int, float)) or parts <= 0:
+            abort(422)
+    return recipe
+
 ## ROUTES
 '''
-@TODO implement endpoint
     GET /drinks
-        it should be a public endpoint
-        it should contain only the drink.short() data representation
+        a public endpoint
+        contains only the drink.short() data representation
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks')
+def get_drinks():
+    return menu_snapshots.response('short')
 
 
 '''
-@TODO implement endpoint
     GET /drinks-detail
-        it should require the 'get:drinks-detail' permission
-        it should contain the drink.long() data representation
+        requires the 'get:drinks-detail' permission
+        contains the drink.long() data representation
     returns status code 200 and json {"success": True, "drinks": drinks} where drinks is the list of drinks
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks-detail')
+@requires_auth('get:drinks-detail')
+def get_drinks_detail(payload):
+    return menu_snapshots.response('long')
 
 
 '''
-@TODO implement endpoint
     POST /drinks
-        it should create a new row in the drinks table
-        it should require the 'post:drinks' permission
-        it should contain the drink.long() data representation
+        creates a new row in the drinks table
+        requires the 'post:drinks' permission
+        contains the drink.long() data representation
     returns status code 200 and json {"success": True, "drinks": drink} where drink an array containing only the newly created drink
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks', methods=['POST'])
+@requires_auth('post:drinks')
+def create_drink(payload):
+    body = request.get_json(silent=True) or {}
+    title = body.get('title')
+    recipe = body.get('recipe')
+    if not title or not recipe:
+        abort(400)
+    recipe = recipe_items(recipe)
+
+    try:
+        drink = Drink(title=title, recipe=json.dumps(recipe))
+        drink.insert()
+    except exc.SQLAlchemyError:
+        Drink.query.session.rollback()
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        'drinks': [drink.long()]
+    })
 
 
 '''
-@TODO implement endpoint
     PATCH /drinks/<id>
         where <id> is the existing model id
-        it should respond with a 404 error if <id> is not found
-        it should update the corresponding row for <id>
-        it should require the 'patch:drinks' permission
-        it should contain the drink.long() data representation
+        responds with a 404 error if <id> is not found
+        updates the corresponding row for <id>
+        requires the 'patch:drinks' permission
+        contains the drink.long() data representation
     returns status code 200 and json {"success": True, "drinks": drink} where drink an array containing only the updated drink
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks/<int:id>', methods=['PATCH'])
+@requires_auth('patch:drinks')
+def update_drink(payload, id):
+    drink = Drink.query.get(id)
+    if drink is None:
+        abort(404)
+
+    body = request.get_json(silent=True) or {}
+    if 'title' in body:
+        drink.title = body['title']
+    if 'recipe' in body:
+        drink.recipe = json.dumps(recipe_items(body['recipe']))
+
+    try:
+        drink.update()
+    except exc.SQLAlchemyError:
+        Drink.query.session.rollback()
+        abort(422)
+
+    return jsonify({
+        'success': True,
+        'drinks': [drink.long()]
+    })
 
 
 '''
-@TODO implement endpoint
     DELETE /drinks/<id>
         where <id> is the existing model id
-        it should respond with a 404 error if <id> is not found
-        it should delete the corresponding row for <id>
-        it should require the 'delete:drinks' permission
+        responds with a 404 error if <id> is not found
+        deletes the corresponding row for <id>
+        requires the 'delete:drinks' permission
     returns status code 200 and json {"success": True, "delete": id} where id is the id of the deleted record
         or appropriate status code indicating reason for failure
 '''
+@app.route('/drinks/<int:id>', methods=['DELETE'])
+@requires_auth('delete:drinks')
+def delete_drink(payload, id):
+    drink = Drink.query.get(id)
+    if drink is None:
+        abort(404)
+
+    drink.delete()
+    return jsonify({
+        'success': True,
+        'delete': id
+    })
+
+
+'''
+    POST /logout
+        requires a valid token, with or without permissions
+        revokes the bearer token, so it is rejected until it expires
+    returns status code 200 and json {"success": True}
+'''
+@app.route('/logout', methods=['POST'])
+@requires_auth()
+def logout(payload):
+    revoke_token(get_token_auth_header(), payload)
+    return jsonify({
+        'success': True
+    })
 
 
 ## Error Handling
@@ -88,23 +242,35 @@ def unprocessable(error):
                     }), 422
 
 '''
-@TODO implement error handlers using the @app.errorhandler(error) decorator
-    each error handler should return (with approprate messages):
-             jsonify({
-                    "success": False, 
-                    "error": 404,
-                    "message": "resource not found"
-                    }), 404
-
+error handling for bad requests
 '''
+@app.errorhandler(400)
+def bad_request(error):
+    return jsonify({
+                    "success": False, 
+                    "error": 400,
+                    "message": "bad request"
+                    }), 400
 
 '''
-@TODO implement error handler for 404
-    error handler should conform to general task above 
+error handling for resources that do not exist
 '''
+@app.errorhandler(404)
+def not_found(error):
+    return jsonify({
+                    "success": False, 
+                    "error": 404,
+                    "message": "resource not found"
+                    }), 404
 
 
 '''
-@TODO implement error handler for AuthError
-    error handler should conform to general task above 
+error handling for failed authentication and authorization
 '''
+@app.errorhandler(AuthError)
+def auth_error(error):
+    return jsonify({
+                    "success": False, 
+                    "error": error.status_code,
+                    "message": error.error['description']
+                    }), error.status_code
@@ -1,14 +1,32 @@
-import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSKeyStore
+from .token_cache import VerifiedTokenCache
 
 
 AUTH0_DOMAIN = 'udacity-fsnd.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'dev'
 
+'''
+signing keys are cached by kid and refreshed in the background;
+set JWKS_FILE to a local jwks.json to run without network access
+'''
+key_store = JWKSKeyStore(
+    url=f'https://{AUTH0_DOMAIN}/.well-known/jwks.json',
+    path=os.environ.get('JWKS_FILE')
+)
+
+'''
+verified payloads are reused until the token expires; tokens signed with
+a key that leaves the JWKS are dropped when the key set rotates
+'''
+token_cache = VerifiedTokenCache(maxsize=int(os.environ.get('TOKEN_CACHE_SIZE', 1024)))
+key_store.on_rotation(token_cache.drop_kids)
+
 ## AuthError Exception
 '''
 AuthError Exception
@@ -31,7 +49,59 @@ class AuthError(Exception):
     return the token part of the header
 '''
 def get_token_auth_header():
-   raise Exception('Not Implemented')
+    auth = request.headers.get('Authorization', None)
+    if not auth:
+        raise AuthError({
+            'code': 'authorization_header_missing',
+            'description': 'Authorization header is expected.'
+        }, 401)
+
+    parts = auth.split()
+    if parts[0].lower() != 'bearer':
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must start with "Bearer".'
+        }, 401)
+
+    elif len(parts) == 1:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Token not found.'
+        }, 401)
+
+    elif len(parts) > 2:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization header must be bearer token.'
+        }, 401)
+
+    return parts[1]
+
+'''
+Claims
+    a verified JWT payload. It is still the plain dict routes receive, with
+    the permissions claim compiled once into the granted frozenset so that
+    permission checks are set lookups instead of list scans. Claims are
+    what token_cache stores, so a reused token never recompiles them
+'''
+class Claims(dict):
+    def __init__(self, payload):
+        super().__init__(payload)
+        self.granted = frozenset(payload.get('permissions') or ())
+
+
+'''
+permission_set(permissions)
+    a frozenset of permission strings from a single string or an iterable,
+    ignoring empty strings
+'''
+def permission_set(permissions):
+    if isinstance(permissions, frozenset):
+        return permissions
+    if isinstance(permissions, str):
+        permissions = [permissions]
+    return frozenset(permission for permission in permissions if permission)
+
 
 '''
 @TODO implement check_permissions(permission, payload) method
@@ -43,9 +113,27 @@ def get_token_auth_header():
         !!NOTE check your RBAC settings in Auth0
     it should raise an AuthError if the requested permission string is not in the payload permissions array
     return true otherwise
+
+    permission may also be a set of permissions that are all required, and
+    any_of a set of which at least one is required
 '''
-def check_permissions(permission, payload):
-    raise Exception('Not Implemented')
+def check_permissions(permission, payload, any_of=frozenset()):
+    if 'permissions' not in payload:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Permissions not included in JWT.'
+        }, 400)
+
+    if not isinstance(payload, Claims):
+        payload = Claims(payload)
+    any_of = permission_set(any_of)
+    if not permission_set(permission) <= payload.granted or \
+            (any_of and payload.granted.isdisjoint(any_of)):
+        raise AuthError({
+            'code': 'unauthorized',
+            'description': 'Permission not found.'
+        }, 403)
+    return True
 
 '''
 @TODO implement verify_decode_jwt(token) method
@@ -61,7 +149,83 @@ def check_permissions(permission, payload):
     !!NOTE urlopen has a common certificate error described here: https://stackoverflow.com/questions/50236117/scraping-ssl-certificate-verify-failed-error-for-http-en-wikipedia-org
 '''
 def verify_decode_jwt(token):
-    raise Exception('Not Implemented')
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 401)
+    if 'kid' not in unverified_header:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Authorization malformed.'
+        }, 401)
+
+    try:
+        rsa_key = key_store.get_key(unverified_header['kid'])
+    except Exception:
+        raise AuthError({
+            'code': 'jwks_unavailable',
+            'description': 'Unable to fetch the signing keys.'
+        }, 503)
+    if not rsa_key:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to find the appropriate key.'
+        }, 400)
+
+    try:
+        return jwt.decode(
+            token,
+            rsa_key,
+            algorithms=ALGORITHMS,
+            audience=API_AUDIENCE,
+            issuer='https://' + AUTH0_DOMAIN + '/'
+        )
+
+    except jwt.ExpiredSignatureError:
+        raise AuthError({
+            'code': 'token_expired',
+            'description': 'Token expired.'
+        }, 401)
+
+    except jwt.JWTClaimsError:
+        raise AuthError({
+            'code': 'invalid_claims',
+            'description': 'Incorrect claims. Please, check the audience and issuer.'
+        }, 401)
+    except Exception:
+        raise AuthError({
+            'code': 'invalid_header',
+            'description': 'Unable to parse authentication token.'
+        }, 400)
+
+'''
+verified_payload(token)
+    the decoded payload of token, served from token_cache when the same
+    token was verified before. Revoked tokens are rejected on both paths:
+    token_cache never serves them and a fresh verification is checked
+    against the blocklist
+'''
+def verified_payload(token):
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = Claims(verify_decode_jwt(token))
+        if token_cache.is_revoked(token, payload):
+            raise AuthError({
+                'code': 'token_revoked',
+                'description': 'Token has been revoked.'
+            }, 401)
+        token_cache.put(token, jwt.get_unverified_header(token)['kid'], payload)
+    return payload
+
+'''
+revoke_token(token, payload)
+    blocks a verified token until it expires, e.g. when its user logs out
+'''
+def revoke_token(token, payload):
+    token_cache.revoke(token, payload)
 
 '''
 @TODO implement @requires_auth(permission) decorator method
@@ -72,15 +236,25 @@ def verify_decode_jwt(token):
     it should use the verify_decode_jwt method to decode the jwt
     it should use the check_permissions method validate claims and check the requested permission
     return the decorator which passes the decoded payload to the decorated method
+
+    several permissions may be passed, all of which are required, and
+    any_of lists alternatives of which one is enough. Both are compiled
+    into frozensets when the route is declared
+    EXAMPLE
+        @requires_auth('patch:drinks')
+        @requires_auth(any_of=('get:drinks-detail', 'patch:drinks'))
 '''
-def requires_auth(permission=''):
+def requires_auth(*permissions, any_of=()):
+    required = permission_set(permissions)
+    alternatives = permission_set(any_of)
+
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
+            payload = verified_payload(token)
+            check_permissions(required, payload, alternatives)
             return f(payload, *args, **kwargs)
 
         return wrapper
-    return requires_auth_decorator
\ No newline at end of file
+    return requires_auth_decorator
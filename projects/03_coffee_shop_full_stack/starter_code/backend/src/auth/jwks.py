@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from urllib.request import urlopen
+
+
+'''
+JWKSKeyStore
+    caches the signing keys of a JSON Web Key Set by key id (kid)
+
+    keys are fetched from url (or read from path, so tests run without
+    network) and kept for ttl seconds. A daemon thread refreshes them
+    refresh_margin seconds before they expire, so requests never wait on
+    the network while the key set is healthy. An unknown kid triggers one
+    refetch, at most once per min_refetch_interval seconds, to pick up a
+    rotated key without letting bad tokens hammer the identity provider.
+    Only one fetch runs at a time; concurrent lookups wait for it and use
+    its keys. If a refresh fails the previous keys are kept.
+
+    EXAMPLE
+        key_store = JWKSKeyStore(url=f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
+        rsa_key = key_store.get_key(unverified_header['kid'])
+'''
+class JWKSKeyStore:
+    def __init__(self, url=None, path=None, ttl=3600, refresh_margin=300,
+                 min_refetch_interval=30, timeout=5):
+        if not url and not path:
+            raise ValueError('a JWKS url or path is required')
+        self.url = url
+        self.path = path
+        self.ttl = ttl
+        self.refresh_margin = min(refresh_margin, ttl / 2)
+        self.min_refetch_interval = min_refetch_interval
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+        self.keys = {}
+        self.expires_at = 0
+        self.fetched_at = None
+        self.failed_at = None
+        self.refresher = None
+        self.rotation_listeners = []
+
+    def fetch(self):
+        if self.path:
+            with open(self.path) as f:
+                return json.load(f)
+        with urlopen(self.url, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def _load(self):
+        # callers hold fetch_lock
+        keys = {
+            key['kid']: {
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key.get('use'),
+                'n': key['n'],
+                'e': key['e']
+            }
+            for key in self.fetch()['keys'] if 'kid' in key
+        }
+        with self.lock:
+            removed = set(self.keys) - set(keys)
+            self.keys = keys
+            self.fetched_at = time.monotonic()
+            self.expires_at = self.fetched_at + self.ttl
+        for listener in self.rotation_listeners:
+            listener(removed)
+        return keys
+
+    def refresh(self):
+        '''
+        loads the key set, replacing the cached keys, and makes sure the
+        background refresher is running. Listeners registered with
+        on_rotation() are called with the kids that were dropped
+        '''
+        with self.fetch_lock:
+            keys = self._load()
+        self.start()
+        return keys
+
+    def on_rotation(self, listener):
+        self.rotation_listeners.append(listener)
+
+    def _cached(self, kid):
+        with self.lock:
+            return self.keys.get(kid), time.monotonic() < self.expires_at
+
+    def get_key(self, kid):
+        key, fresh = self._cached(kid)
+        if key is not None and fresh:
+            return key
+        with self.fetch_lock:
+            # callers that waited here for another thread's fetch find its keys
+            key, fresh = self._cached(kid)
+            if key is not None and fresh:
+                return key
+            now = time.monotonic()
+            if fresh and now - self.fetched_at < self.min_refetch_interval:
+                # unknown kid, but the key set was fetched moments ago
+                return None
+            if self.keys and self.failed_at is not None and \
+                    now - self.failed_at < self.min_refetch_interval:
+                # the provider just failed: keep serving the previous keys
+                return key
+            try:
+                self._load()
+            except Exception:
+                self.failed_at = time.monotonic()
+                if not self.keys:
+                    raise
+                return key
+        self.start()
+        return self._cached(kid)[0]
+
+    def start(self):
+        '''
+        starts the background refresher once keys have been loaded
+        '''
+        with self.lock:
+            if self.refresher is None or not self.refresher.is_alive():
+                self.refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+                self.refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            delay = self.expires_at - self.refresh_margin - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                with self.fetch_lock:
+                    self._load()
+            except Exception:
+                # retry soon; get_key() still serves the previous keys
+                time.sleep(min(self.min_refetch_interval, self.refresh_margin))
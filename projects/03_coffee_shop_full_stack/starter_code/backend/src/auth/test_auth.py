@@ -0,0 +1,93 @@
+import time
+import unittest
+from unittest import mock
+
+from src.auth.auth import AuthError, Claims, check_permissions, requires_auth
+from src.api import app
+
+
+class CheckPermissionsTestCase(unittest.TestCase):
+    """This class represents the permission check test case"""
+
+    def setUp(self):
+        self.payload = Claims({'sub': 'barista', 'permissions': ['get:drinks-detail', 'patch:drinks']})
+
+    def assertAuthError(self, status_code, *args, **kwargs):
+        with self.assertRaises(AuthError) as raised:
+            check_permissions(*args, **kwargs)
+        self.assertEqual(raised.exception.status_code, status_code)
+
+    def test_all_of_required(self):
+        self.assertTrue(check_permissions('patch:drinks', self.payload))
+        self.assertTrue(check_permissions(['get:drinks-detail', 'patch:drinks'], self.payload))
+        self.assertAuthError(403, ['patch:drinks', 'delete:drinks'], self.payload)
+
+    def test_any_of_alternatives(self):
+        self.assertTrue(check_permissions((), self.payload, any_of=('delete:drinks', 'patch:drinks')))
+        self.assertAuthError(403, (), self.payload, any_of=('delete:drinks', 'post:drinks'))
+        self.assertAuthError(403, 'delete:drinks', self.payload, any_of=('patch:drinks',))
+
+    def test_plain_dict_payload(self):
+        self.assertTrue(check_permissions('patch:drinks', {'permissions': ['patch:drinks']}))
+
+    def test_400_without_permissions_claim(self):
+        self.assertAuthError(400, 'patch:drinks', {'sub': 'barista'})
+
+    def test_403_without_grant(self):
+        self.assertAuthError(403, 'delete:drinks', self.payload)
+        self.assertAuthError(403, 'get:drinks-detail', Claims({'permissions': []}))
+
+
+class AuthErrorHandlerTestCase(unittest.TestCase):
+    """This class represents the AuthError handling of the API"""
+
+    def setUp(self):
+        self.client = app.test_client
+
+    def get_detail(self, payload):
+        with mock.patch('src.auth.auth.verified_payload', return_value=payload):
+            return self.client().get('/drinks-detail', headers={'Authorization': 'Bearer token'})
+
+    def assertError(self, res, status_code, message):
+        self.assertEqual(res.status_code, status_code)
+        self.assertEqual(res.get_json(), {'success': False, 'error': status_code, 'message': message})
+
+    def test_401_without_authorization_header(self):
+        self.assertError(self.client().get('/drinks-detail'), 401, 'Authorization header is expected.')
+
+    def test_401_with_malformed_header(self):
+        res = self.client().get('/drinks-detail', headers={'Authorization': 'Token abc'})
+        self.assertError(res, 401, 'Authorization header must start with "Bearer".')
+
+    def test_400_without_permissions_claim(self):
+        self.assertError(self.get_detail(Claims({'sub': 'barista'})), 400, 'Permissions not included in JWT.')
+
+    def test_403_without_grant(self):
+        res = self.get_detail(Claims({'sub': 'barista', 'permissions': ['post:drinks']}))
+        self.assertError(res, 403, 'Permission not found.')
+
+    def test_logout_revokes_token(self):
+        claims = {'sub': 'barista', 'exp': time.time() + 60, 'permissions': []}
+        headers = {'Authorization': 'Bearer logout-token'}
+        with mock.patch('src.auth.auth.verify_decode_jwt', return_value=claims), \
+                mock.patch('src.auth.auth.jwt.get_unverified_header', return_value={'kid': 'kid-a'}):
+            self.assertEqual(self.client().post('/logout', headers=headers).status_code, 200)
+            self.assertError(self.client().post('/logout', headers=headers), 401, 'Token has been revoked.')
+
+    def test_any_of_route(self):
+        @requires_auth(any_of=('get:drinks-detail', 'patch:drinks'))
+        def view(payload):
+            return payload['sub']
+
+        with app.test_request_context(headers={'Authorization': 'Bearer token'}):
+            with mock.patch('src.auth.auth.verified_payload',
+                            return_value=Claims({'sub': 'barista', 'permissions': ['patch:drinks']})):
+                self.assertEqual(view(), 'barista')
+            with mock.patch('src.auth.auth.verified_payload',
+                            return_value=Claims({'sub': 'customer', 'permissions': []})):
+                self.assertRaises(AuthError, view)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
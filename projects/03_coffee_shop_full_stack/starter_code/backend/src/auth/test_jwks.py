@@ -0,0 +1,84 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from src.auth.jwks import JWKSKeyStore
+
+
+def jwk(kid):
+    return {'kty': 'RSA', 'kid': kid, 'use': 'sig', 'n': 'n-' + kid, 'e': 'AQAB'}
+
+
+class JWKSKeyStoreTestCase(unittest.TestCase):
+    """This class represents the JWKS key store test case"""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        self.write_keys('a')
+        self.store = JWKSKeyStore(path=self.path)
+        self.fetches = 0
+        fetch = self.store.fetch
+
+        def counting_fetch():
+            self.fetches += 1
+            return fetch()
+        self.store.fetch = counting_fetch
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def write_keys(self, *kids):
+        with open(self.path, 'w') as f:
+            json.dump({'keys': [jwk(kid) for kid in kids]}, f)
+
+    def test_loads_keys_from_file(self):
+        key = self.store.get_key('a')
+        self.assertEqual(key, {'kty': 'RSA', 'kid': 'a', 'use': 'sig', 'n': 'n-a', 'e': 'AQAB'})
+        self.assertEqual(self.store.get_key('a'), key)
+        self.assertEqual(self.fetches, 1)
+
+    def test_unknown_kid_refetches_once_per_interval(self):
+        self.store.get_key('a')
+        self.write_keys('a', 'b')
+        # the key set was fetched moments ago: no refetch for an unknown kid
+        self.assertIsNone(self.store.get_key('b'))
+        self.assertEqual(self.fetches, 1)
+
+        self.store.fetched_at -= self.store.min_refetch_interval
+        self.assertEqual(self.store.get_key('b')['kid'], 'b')
+        self.assertEqual(self.fetches, 2)
+        self.assertIsNone(self.store.get_key('c'))
+        self.assertEqual(self.fetches, 2)
+
+    def test_concurrent_cold_start_fetches_once(self):
+        fetch = self.store.fetch
+
+        def slow_fetch():
+            time.sleep(0.1)
+            return fetch()
+        self.store.fetch = slow_fetch
+
+        keys = []
+        threads = [threading.Thread(target=lambda: keys.append(self.store.get_key('a'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([key['kid'] for key in keys], ['a'] * 8)
+        self.assertEqual(self.fetches, 1)
+
+    def test_failed_refresh_keeps_previous_keys(self):
+        self.store.get_key('a')
+        os.remove(self.path)
+        self.store.expires_at = 0
+        self.assertEqual(self.store.get_key('a')['kid'], 'a')
+        self.write_keys('a')
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+import time
+import unittest
+
+from src.auth.token_cache import VerifiedTokenCache
+
+
+class Claims(dict):
+    # stands in for src.auth.auth.Claims, which needs flask and jose
+    def __init__(self, payload):
+        super().__init__(payload)
+        self.granted = frozenset(payload.get('permissions') or ())
+
+
+class VerifiedTokenCacheTestCase(unittest.TestCase):
+    """This class represents the verified token cache test case"""
+
+    def setUp(self):
+        self.cache = VerifiedTokenCache(maxsize=2)
+        self.payload = {'sub': 'user', 'exp': time.time() + 60, 'permissions': ['get:drinks-detail']}
+
+    def test_hit_until_expiry(self):
+        self.cache.put('token', 'kid-a', self.payload)
+        self.assertEqual(self.cache.get('token'), self.payload)
+
+        self.cache.put('expired', 'kid-a', dict(self.payload, exp=time.time() - 1))
+        self.assertIsNone(self.cache.get('expired'))
+
+        self.cache.entries[self.cache.digest('token')] = (time.time() - 1, 'kid-a', self.payload)
+        self.assertIsNone(self.cache.get('token'))
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_tokens_without_exp_not_cached(self):
+        self.cache.put('token', 'kid-a', {'sub': 'user'})
+        self.assertIsNone(self.cache.get('token'))
+
+    def test_least_recently_used_evicted(self):
+        for token in ('a', 'b'):
+            self.cache.put(token, 'kid-a', self.payload)
+        self.cache.get('a')
+        self.cache.put('c', 'kid-a', self.payload)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+
+    def test_drop_kids_forgets_rotated_keys(self):
+        self.cache.put('a', 'kid-a', self.payload)
+        self.cache.put('b', 'kid-b', self.payload)
+        self.cache.drop_kids({'kid-a'})
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('b'))
+
+    def test_cached_payload_cannot_be_changed_by_callers(self):
+        self.cache.put('token', 'kid-a', self.payload)
+        self.payload['sub'] = 'changed after put'
+        payload = self.cache.get('token')
+        payload['sub'] = 'changed after get'
+        self.assertEqual(self.cache.get('token')['sub'], 'user')
+
+    def test_claims_keep_granted_set(self):
+        self.cache.put('token', 'kid-a', Claims(self.payload))
+        payload = self.cache.get('token')
+        self.assertIsInstance(payload, Claims)
+        self.assertEqual(payload.granted, frozenset(['get:drinks-detail']))
+
+    def test_revoked_jti_rejected_until_expiry(self):
+        payload = dict(self.payload, jti='jti-a')
+        self.cache.put('a', 'kid-a', payload)
+        self.cache.put('b', 'kid-a', payload)
+        self.cache.revoke('a', payload)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertTrue(self.cache.is_revoked('a', payload))
+        self.cache.put('a', 'kid-a', payload)
+        self.assertIsNone(self.cache.get('a'))
+
+        self.cache.revoked['jti-a'] = time.time() - 1
+        self.assertFalse(self.cache.is_revoked('a', payload))
+        self.assertEqual(self.cache.stats()['revoked'], 0)
+
+    def test_token_without_jti_revoked_by_digest(self):
+        self.cache.put('a', 'kid-a', self.payload)
+        self.cache.put('b', 'kid-a', self.payload)
+        self.cache.revoke('a', self.payload)
+        self.assertTrue(self.cache.is_revoked('a', self.payload))
+        self.assertFalse(self.cache.is_revoked('b', self.payload))
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('b'))
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+'''
+VerifiedTokenCache
+    bounded LRU of decoded JWT payloads, keyed by a SHA-256 of the token,
+    so a bearer token reused across requests is verified only once
+
+    an entry lives until the token's exp claim. Tokens without exp are
+    never cached. revoke() drops a token and remembers its jti (or, without
+    one, the token's digest) until it expires, so it is rejected even if it
+    is verified again. Entries signed with a key that rotated out of the
+    JWKS are dropped by drop_kids(). put() and get() hand out shallow
+    copies: a route that sets keys on its payload cannot change the cached
+    one, and a Claims payload keeps its compiled granted set.
+
+    EXAMPLE
+        payload = token_cache.get(token)
+        if payload is None:
+            payload = verify_decode_jwt(token)
+            if token_cache.is_revoked(token, payload):
+                reject(token)
+            token_cache.put(token, kid, payload)
+'''
+class VerifiedTokenCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.revoked = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def revocation_key(self, token, payload):
+        return payload.get('jti') or self.digest(token)
+
+    def get(self, token):
+        key = self.digest(token)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and (entry[0] <= now or
+                                      self.revocation_key(token, entry[2]) in self.revoked):
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+        return copy.copy(entry[2])
+
+    def put(self, token, kid, payload):
+        expires = payload.get('exp')
+        if not isinstance(expires, (int, float)) or expires <= time.time():
+            return
+        key = self.digest(token)
+        payload = copy.copy(payload)
+        with self.lock:
+            if self.revocation_key(token, payload) in self.revoked:
+                return
+            self.entries[key] = (expires, kid, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def is_revoked(self, token, payload):
+        revocation_key = self.revocation_key(token, payload)
+        with self.lock:
+            expires = self.revoked.get(revocation_key)
+            if expires is not None and expires <= time.time():
+                del self.revoked[revocation_key]
+                return False
+            return expires is not None
+
+    def revoke(self, token, payload):
+        '''
+        rejects token, and every token sharing its jti, until payload's exp
+        '''
+        revocation_key = self.revocation_key(token, payload)
+        expires = payload.get('exp')
+        if not isinstance(expires, (int, float)):
+            expires = time.time() + 86400
+        now = time.time()
+        with self.lock:
+            self.revoked[revocation_key] = expires
+            self.entries.pop(self.digest(token), None)
+            if payload.get('jti'):
+                for key in [key for key, entry in self.entries.items()
+                            if entry[2].get('jti') == payload['jti']]:
+                    del self.entries[key]
+            for stale in [stale for stale, until in self.revoked.items() if until <= now]:
+                del self.revoked[stale]
+
+    def drop_kids(self, kids):
+        '''
+        forgets tokens signed with keys that are no longer published
+        '''
+        if not kids:
+            return
+        with self.lock:
+            for key in [key for key, entry in self.entries.items() if entry[1] in kids]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self.entries),
+            'revoked': len(self.revoked)
+        }
@@ -0,0 +1,86 @@
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool, QueuePool
+
+
+'''
+SQLITE_PROFILES
+    engine profiles for the SQLite drinks database
+
+    default keeps SQLite's own settings: a rollback journal, which lets a
+    writer lock out every reader, and a fresh connection per checkout. It
+    sets journal_mode=DELETE explicitly, since the journal mode is stored in
+    the database file and a file once opened with tuned would stay in WAL.
+    tuned switches to WAL so readers and one writer proceed concurrently,
+    relaxes fsyncs to synchronous=NORMAL (safe under WAL), waits up to
+    busy_timeout ms for a lock instead of failing with "database is
+    locked", memory-maps the file and enlarges the page cache. Its pool
+    keeps connections open so the pragmas run once per connection. Because
+    WAL is written into the database file, tuned is opt-in rather than
+    applied to the committed database.db on import.
+'''
+SQLITE_PROFILES = {
+    'default': {
+        'pragmas': {
+            'journal_mode': 'DELETE',
+        },
+        'engine_options': {
+            'poolclass': NullPool,
+        },
+    },
+    'tuned': {
+        'pragmas': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'busy_timeout': 5000,
+            'mmap_size': 256 * 1024 * 1024,
+            # negative sizes are KiB: 64 MiB of page cache per connection
+            'cache_size': -64 * 1024,
+        },
+        'engine_options': {
+            'poolclass': QueuePool,
+            'pool_size': 5,
+            'max_overflow': 10,
+            'connect_args': {'check_same_thread': False, 'timeout': 5},
+        },
+    },
+}
+
+DEFAULT_PROFILE = 'default'
+
+
+'''
+engine_options(profile)
+    the create_engine() keyword arguments of a profile, as used for
+    SQLALCHEMY_ENGINE_OPTIONS
+'''
+def engine_options(profile=DEFAULT_PROFILE):
+    if profile not in SQLITE_PROFILES:
+        raise ValueError('unknown SQLite profile {!r}'.format(profile))
+    options = dict(SQLITE_PROFILES[profile]['engine_options'])
+    if 'connect_args' in options:
+        options['connect_args'] = dict(options['connect_args'])
+    return options
+
+
+'''
+apply_pragmas(engine, profile, overrides)
+    runs the profile's pragmas, updated with overrides, on every new DBAPI
+    connection the engine opens
+    EXAMPLE
+        engine = create_engine(url, **engine_options('tuned'))
+        apply_pragmas(engine, 'tuned')
+'''
+def apply_pragmas(engine, profile=DEFAULT_PROFILE, overrides=None):
+    pragmas = dict(SQLITE_PROFILES[profile]['pragmas'])
+    pragmas.update(overrides or {})
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute('PRAGMA {} = {}'.format(name, value))
+        finally:
+            cursor.close()
@@ -2,6 +2,9 @@ import os
 from sqlalchemy import Column, String, Integer
 from flask_sqlalchemy import SQLAlchemy
 import json
+import threading
+
+from .engine import DEFAULT_PROFILE, engine_options, apply_pragmas
 
 database_filename = "database.db"
 project_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,14 +13,22 @@ database_path = "sqlite:///{}".format(os.path.join(project_dir, database_filenam
 db = SQLAlchemy()
 
 '''
-setup_db(app)
+setup_db(app, database_path)
     binds a flask application and a SQLAlchemy service
+    database_path defaults to database.db next to this module; tests pass
+    a scratch database
+    the engine follows the SQLITE_PROFILE environment variable ('default' or
+    'tuned', see engine.py); SQLITE_PRAGMAS in the app config overrides
+    individual pragmas, e.g. {'synchronous': 'FULL'}
 '''
-def setup_db(app):
+def setup_db(app, database_path=database_path):
+    profile = os.environ.get('SQLITE_PROFILE', DEFAULT_PROFILE)
     app.config["SQLALCHEMY_DATABASE_URI"] = database_path
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config.setdefault("SQLALCHEMY_ENGINE_OPTIONS", engine_options(profile))
     db.app = app
     db.init_app(app)
+    apply_pragmas(db.get_engine(app), profile, app.config.get("SQLITE_PRAGMAS"))
 
 '''
 db_drop_and_create_all()
@@ -29,6 +40,53 @@ def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
+'''
+RecipeProjections
+    process-wide cache of each drink's parsed recipe and short recipe,
+    keyed by drink id. An entry is only served while its raw recipe blob
+    still matches the row, so edits made by another worker are picked up;
+    insert() and update() refresh the entry and delete() drops it
+'''
+class RecipeProjections:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, drink):
+        entry = self.entries.get(drink.id)
+        if entry is not None and entry[0] == drink.recipe:
+            return entry
+        return self.refresh(drink)
+
+    def refresh(self, drink):
+        recipe = json.loads(drink.recipe)
+        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in recipe]
+        entry = (drink.recipe, recipe, short_recipe)
+        if drink.id is not None:
+            with self.lock:
+                self.entries[drink.id] = entry
+        return entry
+
+    def drop(self, drink_id):
+        with self.lock:
+            self.entries.pop(drink_id, None)
+
+recipe_projections = RecipeProjections()
+
+'''
+on_drinks_changed(listener)
+    registers a callable invoked with no arguments after every committed
+    insert, update or delete of a drink
+'''
+change_listeners = []
+
+def on_drinks_changed(listener):
+    change_listeners.append(listener)
+
+def drinks_changed():
+    for listener in change_listeners:
+        listener()
+
 '''
 Drink
 a persistent drink entity, extends the base SQLAlchemy Model
@@ -47,12 +105,10 @@ class Drink(db.Model):
         short form representation of the Drink model
     '''
     def short(self):
-        print(json.loads(self.recipe))
-        short_recipe = [{'color': r['color'], 'parts': r['parts']} for r in json.loads(self.recipe)]
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': short_recipe
+            'recipe': recipe_projections.get(self)[2]
         }
 
     '''
@@ -63,7 +119,7 @@ class Drink(db.Model):
         return {
             'id': self.id,
             'title': self.title,
-            'recipe': json.loads(self.recipe)
+            'recipe': recipe_projections.get(self)[1]
         }
 
     '''
@@ -78,6 +134,8 @@ class Drink(db.Model):
     def insert(self):
         db.session.add(self)
         db.session.commit()
+        recipe_projections.refresh(self)
+        drinks_changed()
 
     '''
     delete()
@@ -88,8 +146,11 @@ class Drink(db.Model):
             drink.delete()
     '''
     def delete(self):
+        drink_id = self.id
         db.session.delete(self)
         db.session.commit()
+        recipe_projections.drop(drink_id)
+        drinks_changed()
 
     '''
     update()
@@ -102,6 +163,8 @@ class Drink(db.Model):
     '''
     def update(self):
         db.session.commit()
+        recipe_projections.refresh(self)
+        drinks_changed()
 
     def __repr__(self):
         return json.dumps(self.short())
\ No newline at end of file
@@ -0,0 +1,68 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.api import app
+from src.database.models import db, setup_db, Drink, recipe_projections
+
+
+class DrinkProjectionTestCase(unittest.TestCase):
+    """This class represents the drink recipe projection test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        # a scratch database, so the committed database.db stays untouched
+        cls.database_dir = tempfile.mkdtemp()
+        setup_db(app, 'sqlite:///{}'.format(os.path.join(cls.database_dir, 'test.db')))
+        with app.app_context():
+            db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.get_engine(app).dispose()
+        shutil.rmtree(cls.database_dir)
+
+    def setUp(self):
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.drink = Drink(title='Test Flat White', recipe=json.dumps([
+            {'name': 'espresso', 'color': 'brown', 'parts': 1},
+            {'name': 'milk', 'color': 'white', 'parts': 2}
+        ]))
+        self.drink.insert()
+
+    def tearDown(self):
+        Drink.query.delete()
+        db.session.commit()
+        db.session.remove()
+        self.ctx.pop()
+
+    def test_insert_stores_projection(self):
+        raw, recipe, short_recipe = recipe_projections.entries[self.drink.id]
+        self.assertEqual(raw, self.drink.recipe)
+        self.assertEqual(short_recipe, [{'color': 'brown', 'parts': 1}, {'color': 'white', 'parts': 2}])
+
+    def test_update_refreshes_short_and_long_projections(self):
+        self.drink.long()
+        self.drink.recipe = json.dumps([{'name': 'oat milk', 'color': 'beige', 'parts': 3}])
+        self.drink.update()
+
+        raw, recipe, short_recipe = recipe_projections.entries[self.drink.id]
+        self.assertEqual(raw, self.drink.recipe)
+        self.assertEqual(recipe, [{'name': 'oat milk', 'color': 'beige', 'parts': 3}])
+        self.assertEqual(short_recipe, [{'color': 'beige', 'parts': 3}])
+        self.assertEqual(self.drink.short()['recipe'], [{'color': 'beige', 'parts': 3}])
+        self.assertEqual(self.drink.long()['recipe'], recipe)
+
+    def test_delete_drops_projection(self):
+        drink_id = self.drink.id
+        self.drink.delete()
+        self.assertNotIn(drink_id, recipe_projections.entries)
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()
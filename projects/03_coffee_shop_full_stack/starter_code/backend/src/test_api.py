@@ -0,0 +1,108 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from src.api import app
+from src.auth.auth import Claims
+from src.database.models import db, setup_db, Drink
+
+
+class MenuTestCase(unittest.TestCase):
+    """This class represents the menu endpoints test case"""
+
+    @classmethod
+    def setUpClass(cls):
+        # a scratch database, so the committed database.db stays untouched
+        cls.database_dir = tempfile.mkdtemp()
+        setup_db(app, 'sqlite:///{}'.format(os.path.join(cls.database_dir, 'test.db')))
+        with app.app_context():
+            db.create_all()
+
+    @classmethod
+    def tearDownClass(cls):
+        with app.app_context():
+            db.get_engine(app).dispose()
+        shutil.rmtree(cls.database_dir)
+
+    def setUp(self):
+        self.client = app.test_client
+        self.ctx = app.app_context()
+        self.ctx.push()
+        self.drink = Drink(title='Test Espresso', recipe=json.dumps([
+            {'name': 'espresso', 'color': 'brown', 'parts': 1}
+        ]))
+        self.drink.insert()
+        self.drink_id = self.drink.id
+        # every permission, without a real token
+        self.auth = mock.patch('src.auth.auth.verified_payload', return_value=Claims({
+            'sub': 'manager', 'permissions': ['post:drinks', 'patch:drinks', 'delete:drinks']
+        }))
+        self.auth.start()
+        self.headers = {'Authorization': 'Bearer token'}
+
+    def tearDown(self):
+        self.auth.stop()
+        Drink.query.delete()
+        db.session.commit()
+        db.session.remove()
+        self.ctx.pop()
+
+    def assertMenuChanged(self, etag):
+        res = self.client().get('/drinks', headers={'If-None-Match': etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers['ETag'], etag)
+        return res.headers['ETag']
+
+    def test_304_when_etag_matches(self):
+        res = self.client().get('/drinks')
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('Test Espresso', [drink['title'] for drink in res.get_json()['drinks']])
+
+        res = self.client().get('/drinks', headers={'If-None-Match': res.headers['ETag']})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.data, b'')
+
+    def test_etag_changes_after_insert_patch_and_delete(self):
+        etag = self.client().get('/drinks').headers['ETag']
+
+        res = self.client().post('/drinks', headers=self.headers, json={
+            'title': 'Test Americano', 'recipe': {'name': 'water', 'color': 'clear', 'parts': 2}
+        })
+        self.assertEqual(res.status_code, 200)
+        etag = self.assertMenuChanged(etag)
+
+        res = self.client().patch('/drinks/%d' % self.drink_id, headers=self.headers,
+                                  json={'title': 'Test Ristretto'})
+        self.assertEqual(res.status_code, 200)
+        etag = self.assertMenuChanged(etag)
+
+        res = self.client().delete('/drinks/%d' % self.drink_id, headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertMenuChanged(etag)
+
+    def test_422_for_malformed_recipe_items(self):
+        for recipe in ([{'name': 'water', 'color': 'clear'}],
+                       [{'name': 'water', 'parts': 1}],
+                       [{'name': 'water', 'color': 'clear', 'parts': 'two'}],
+                       ['water']):
+            res = self.client().post('/drinks', headers=self.headers,
+                                     json={'title': 'Test Broken', 'recipe': recipe})
+            self.assertEqual(res.status_code, 422)
+
+            res = self.client().patch('/drinks/%d' % self.drink_id, headers=self.headers,
+                                      json={'recipe': recipe})
+            self.assertEqual(res.status_code, 422)
+
+        self.assertEqual(Drink.query.filter_by(title='Test Broken').count(), 0)
+        res = self.client().get('/drinks')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([drink['recipe'] for drink in res.get_json()['drinks']],
+                         [[{'color': 'brown', 'parts': 1}]])
+
+
+# Make the tests conveniently executable
+if __name__ == "__main__":
+    unittest.main()